@@ -0,0 +1,50 @@
+"""asyncio adapter for the Cassandra/Scylla driver.
+
+The driver completes requests on its own event loop thread and reports
+them through ResponseFuture callbacks. These helpers hand the pages to the
+running asyncio loop with call_soon_threadsafe, so coroutines can await
+queries directly instead of blocking a worker thread per request, and
+thousands of requests can be in flight from a single thread.
+"""
+import asyncio
+
+
+def _post(loop, pages, item):
+    try:
+        loop.call_soon_threadsafe(pages.put_nowait, item)
+    except RuntimeError:
+        # The loop was closed while the request was in flight; nobody is
+        # waiting for the result any more
+        pass
+
+
+async def iter_pages(session, query, parameters=None):
+    """Yield the result of query page by page.
+
+    The next page is only requested once the consumer asks for it, so a
+    slow consumer doesn't pile up pages in memory.
+    """
+    loop = asyncio.get_running_loop()
+    pages = asyncio.Queue()
+    response_future = session.execute_async(query, parameters)
+    # The driver calls the callbacks again for every page it fetches
+    response_future.add_callbacks(
+        lambda rows: _post(loop, pages, (rows, None)),
+        lambda exc: _post(loop, pages, (None, exc)),
+    )
+    while True:
+        rows, exc = await pages.get()
+        if exc is not None:
+            raise exc
+        yield rows or []
+        if not response_future.has_more_pages:
+            return
+        response_future.start_fetching_next_page()
+
+
+async def execute(session, query, parameters=None):
+    """Run query and return the rows of every page as a list"""
+    rows = []
+    async for page in iter_pages(session, query, parameters):
+        rows.extend(page)
+    return rows
@@ -0,0 +1,393 @@
+"""Offline benchmarks for the ingest and search paths.
+
+Runs main.py's real ingest/search code against the in-memory FakeCluster
+from fakescylla.py (or, with --backend sqlite, the embedded SQLite backend)
+using synthetic leaks from leakgen.py, so no Scylla node is needed. Each case runs in a fresh process and reports rows/sec, peak RSS
+and cumulative time per stage (from metrics.STAGE_SECONDS); results can be
+saved as a baseline and later runs compared against it.
+
+    python bench.py --rows 50000 --save bench_baseline.json
+    python bench.py --rows 50000 --compare bench_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+import leakgen
+import metrics
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+console = Console()
+
+CASES = {}
+
+
+def case(fn):
+    CASES[fn.__name__] = fn
+    return fn
+
+
+def _peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return 0.0
+    info = psutil.Process().memory_info()
+    # peak_wset is the peak working set on Windows
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+def _stage_seconds(since=None):
+    """Seconds per pipeline stage recorded by main.py, less those in since"""
+    since = since or {}
+    return {stage: seconds - since.get(stage, 0.0) for stage, seconds in metrics.stage_seconds().items()
+            if seconds - since.get(stage, 0.0) > 0}
+
+
+def _setup(options):
+    """Import main quietly and return (main module, fake app, executor)"""
+    os.environ['TQDM_DISABLE'] = '1'
+    os.environ['SCYLLA_REJECTS_FILE'] = os.path.join(options['workdir'], f"rejects_{os.getpid()}.jsonl.gz")
+    from concurrent.futures import ThreadPoolExecutor
+    import main
+    import fakescylla
+
+    main.console.quiet = True
+    codec = main.RecordCodec(options['record_zstd'])
+    if options['backend'] == 'sqlite':
+        from storage import SQLiteBackend
+
+        path = os.path.join(options['workdir'], f"bench_{os.getpid()}.db")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        app = SQLiteBackend(path, codec=codec)
+    else:
+        app = fakescylla.fake_scylla_app(
+            latency=options['latency'],
+            failure_rate=options['failure_rate'],
+            failure_kinds=tuple(options['failure_kinds']),
+            seed=options['seed'],
+            codec=codec,
+        )
+    return main, app, ThreadPoolExecutor(max_workers=options['workers'])
+
+
+def _data_file(options, kind):
+    path = os.path.join(options['workdir'], f"leak_{kind}_{options['rows']}_{options['seed']}{leakgen.EXTENSIONS[kind]}")
+    if not os.path.exists(path):
+        leakgen.generate(kind, path, rows=options['rows'], seed=options['seed'])
+    return path
+
+
+@case
+def ingest_csv(options, stages):
+    """process_file on a CSV leak"""
+    path = _data_file(options, 'csv')
+    main, app, executor = _setup(options)
+    start = time.perf_counter()
+    asyncio.run(main.process_file(path, app, executor))
+    elapsed = time.perf_counter() - start
+    stages.update(_stage_seconds())
+    return options['rows'], elapsed, app
+
+
+@case
+def ingest_jsonl(options, stages):
+    """process_file on a JSON lines .txt leak"""
+    path = _data_file(options, 'jsonl')
+    main, app, executor = _setup(options)
+    start = time.perf_counter()
+    asyncio.run(main.process_file(path, app, executor))
+    elapsed = time.perf_counter() - start
+    stages.update(_stage_seconds())
+    return options['rows'], elapsed, app
+
+
+@case
+def insert_records(options, stages):
+    """insert_records_in_batches on pre-parsed records"""
+    records = list(leakgen.LeakGenerator(options['seed']).records(options['rows']))
+    main, app, executor = _setup(options)
+    start = time.perf_counter()
+    asyncio.run(main.insert_records_in_batches(records, 'bench', app, executor=executor))
+    elapsed = time.perf_counter() - start
+    stages.update(_stage_seconds())
+    return len(records), elapsed, app
+
+
+@case
+def insert_batch(options, stages):
+    """insert_batch on pre-parsed records"""
+    records = list(leakgen.LeakGenerator(options['seed']).records(options['rows']))
+    main, app, executor = _setup(options)
+
+    class _Progress:
+        def update(self, n):
+            pass
+
+    start = time.perf_counter()
+    batch_size = 1000
+    for i in range(0, len(records), batch_size):
+        asyncio.run(main.insert_batch(records[i:i + batch_size], 'bench', app, _Progress(), executor))
+    elapsed = time.perf_counter() - start
+    stages.update(_stage_seconds())
+    return len(records), elapsed, app
+
+
+@case
+def search(options, stages):
+    """search_scylla email and username lookups"""
+    gen = leakgen.LeakGenerator(options['seed'], dirty=0)
+    records = list(gen.records(options['rows']))
+    main, app, executor = _setup(options)
+    rows = [{k: v for k, v in record.items() if k in ('email', 'username', 'first_name', 'last_name', 'phone_number')}
+            for record in records]
+    # Through the writer, so injected failures are retried like an ingest's
+    for i in range(0, len(rows), 1000):
+        main.WRITER.write(app, rows[i:i + 1000])
+    seeded = _stage_seconds()
+    rng = random.Random(options['seed'])
+    queries = [
+        f"email:{r['email']}" if rng.random() < 0.5 else f"username:{r['username']}"
+        for r in rng.sample(records, min(options['queries'], len(records)))
+    ]
+
+    async def run():
+        for query in queries:
+            await main.search_scylla(query, app)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    stages.update(_stage_seconds(seeded))
+    return len(queries), elapsed, app
+
+
+@case
+def record_encoding(options, stages):
+    """json.dumps against RecordCodec encode/decode on the same rows"""
+    import main
+    from recordcodec import REFERENCE_COLUMNS, RecordCodec
+
+    records = list(leakgen.LeakGenerator(options['seed']).records(options['rows']))
+    rows = []
+    for record in records:
+        row = {column: main.convert_to_string(record.get(column)) for column in REFERENCE_COLUMNS}
+        row['source'] = 'bench'
+        rows.append(row)
+    codec = RecordCodec(options['record_zstd'])
+
+    start = time.perf_counter()
+    json_bytes = sum(len(json.dumps(record).encode('utf-8')) for record in records)
+    stages['json'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blobs = [codec.encode(record, row) for record, row in zip(records, rows)]
+    stages['encode'] = elapsed = time.perf_counter() - start
+
+    decode_start = time.perf_counter()
+    for blob, row in zip(blobs, rows):
+        codec.decode(blob, row)
+    stages['decode'] = time.perf_counter() - decode_start
+
+    packed_bytes = sum(len(blob) for blob in blobs)
+    console.print(f"json {json_bytes / len(records):.1f} B/row, packed {packed_bytes / len(records):.1f} B/row "
+                  f"({packed_bytes / json_bytes:.0%})")
+    return len(records), elapsed, None
+
+
+# Runs in a fresh interpreter: import main, start against an empty cluster
+# (schema bootstrap), then start again against the same cluster (schema
+# already current), as a search session would after the first launch
+_COLD_START = """
+import json, os, sys, time
+os.environ['TQDM_DISABLE'] = '1'
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.console.quiet = True
+from fakescylla import FakeCluster
+cluster = FakeCluster(latency=float(sys.argv[1]))
+ready = time.perf_counter()
+main.ScyllaApp(cluster=cluster)
+bootstrapped = time.perf_counter()
+main.ScyllaApp(cluster=cluster)
+restarted = time.perf_counter()
+print(json.dumps({'import': imported - start, 'bootstrap': bootstrapped - ready, 'restart': restarted - bootstrapped}))
+"""
+
+
+@case
+def cold_start(options, stages):
+    """Interpreter start, import main and ScyllaApp startup, 5 fresh processes"""
+    runs = 5
+    start = time.perf_counter()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _COLD_START, str(options['latency'])],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for stage in ('import', 'bootstrap', 'restart'):
+            stages[stage] = stages.get(stage, 0.0) + timings[stage] / runs
+    return runs, time.perf_counter() - start, None
+
+
+def _bytes_per_row(app):
+    """Value bytes sent per stored row (fake cluster) or database bytes per row (SQLite)"""
+    if app is None:
+        return 0.0
+    stored = app.count()
+    if not stored:
+        return 0.0
+    if hasattr(app, 'session'):
+        return app.session.stats['bytes'] / app.session.stats['rows_written']
+    size = sum(os.path.getsize(app.path + suffix) for suffix in ('', '-wal') if os.path.exists(app.path + suffix))
+    return size / stored
+
+
+def _run_case(name, options, queue):
+    stages = {}
+    try:
+        rows, seconds, app = CASES[name](options, stages)
+        queue.put({
+            'rows': rows,
+            'seconds': seconds,
+            'rows_per_sec': rows / seconds if seconds else 0.0,
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': stages,
+            'stored': app.count() if app else 0,
+            'requests': app.session.stats['requests'] if hasattr(app, 'session') else 0,
+            'bytes_per_row': _bytes_per_row(app),
+        })
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_case(name, options):
+    """Run one case in a fresh interpreter so peak RSS is per case"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(name, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Return the list of (case, metric, old, new) regressions beyond threshold"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or 'error' in result or 'error' in old:
+            continue
+        if result['rows_per_sec'] < old['rows_per_sec'] * (1 - threshold):
+            regressions.append((name, 'rows/sec', old['rows_per_sec'], result['rows_per_sec']))
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+            regressions.append((name, 'peak RSS MB', old['peak_rss_mb'], result['peak_rss_mb']))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    table = Table(title="Benchmark results", box=box.ROUNDED)
+    for column in ("Case", "Rows", "Rows/sec", "vs baseline", "Peak RSS MB", "Stored", "Bytes/row", "Stages (s)"):
+        table.add_column(column)
+    for name, result in results.items():
+        if 'error' in result:
+            table.add_row(name, '-', '-', '-', '-', '-', '-', f"[red]{result['error']}[/red]")
+            continue
+        delta = '-'
+        if baseline and name in baseline and baseline[name].get('rows_per_sec'):
+            change = result['rows_per_sec'] / baseline[name]['rows_per_sec'] - 1
+            color = 'green' if change >= 0 else 'red'
+            delta = f"[{color}]{change:+.1%}[/{color}]"
+        stages = ', '.join(f"{k}={v:.2f}" for k, v in sorted(result['stages'].items()))
+        table.add_row(name, str(result['rows']), f"{result['rows_per_sec']:,.0f}", delta,
+                      f"{result['peak_rss_mb']:.0f}", str(result['stored']),
+                      f"{result.get('bytes_per_row', 0):.0f}", stages)
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingest/search benchmarks")
+    parser.add_argument('--cases', default=','.join(CASES), help="Comma separated cases: " + ', '.join(CASES))
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500, help="Lookups for the search case")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated request latency in ms")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-kinds', default='timeout', help="timeout, client_timeout, unavailable, overloaded")
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--backend', choices=['scylla', 'sqlite'], default='scylla',
+                        help="Storage backend: the in-memory Scylla stand-in or SQLite")
+    parser.add_argument('--record-zstd', type=int, help="zstd level for stored records (default uncompressed)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'scylla_bench'))
+    parser.add_argument('--save', help="Write results to this baseline file")
+    parser.add_argument('--compare', help="Compare against this baseline file")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Allowed regression before failing")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    options = {
+        'rows': args.rows,
+        'queries': args.queries,
+        'latency': args.latency / 1000,
+        'failure_rate': args.failure_rate,
+        'failure_kinds': args.failure_kinds.split(','),
+        'workers': args.workers,
+        'backend': args.backend,
+        'record_zstd': args.record_zstd,
+        'seed': args.seed,
+        'workdir': args.workdir,
+    }
+    results = {}
+    for name in args.cases.split(','):
+        if name not in CASES:
+            console.print(f"[red]Unknown case: {name}[/red]")
+            continue
+        console.print(f"[cyan]Running {name}...[/cyan]")
+        results[name] = run_case(name, options)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        console.print(f"[green]Baseline saved to {args.save}[/green]")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, old, new in regressions:
+            console.print(f"[red]Regression in {name}: {metric} {old:,.1f} -> {new:,.1f}[/red]")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
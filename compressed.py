@@ -0,0 +1,198 @@
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import zipfile
+import zlib
+
+from jsonl import iter_jsonl_records
+from splitter import iter_lines
+from sqldump import SQLDumpParser
+
+MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bzip2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+    (b'PK\x05\x06', 'zip'),
+]
+COMPRESSED_EXTENSIONS = ('.gz', '.tgz', '.bz2', '.zst', '.xz', '.zip', '.tar')
+READ_BLOCK = 1024 * 1024
+# What a truncated or corrupt member raises while it is being read
+READ_ERRORS = (ValueError, EOFError, OSError, zlib.error, lzma.LZMAError, tarfile.TarError, zipfile.BadZipFile, csv.Error)
+
+
+def _sniff(head):
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    if len(head) >= 262 and head[257:262] == b'ustar':
+        return 'tar'
+    return None
+
+
+def detect_format(file_path):
+    """Return 'gzip', 'bzip2', 'zstd', 'xz', 'zip', 'tar' or None for plain files"""
+    with open(file_path, 'rb') as f:
+        return _sniff(f.read(512))
+
+
+class _CountingReader(io.RawIOBase):
+    """Pass-through reader reporting how many bytes were consumed"""
+
+    def __init__(self, f, progress=None, seekable=True):
+        self.f = f
+        self.progress = progress
+        self._seekable = seekable
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._seekable and self.f.seekable()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.f.seek(offset, whence)
+
+    def tell(self):
+        return self.f.tell()
+
+    def readinto(self, buffer):
+        data = self.f.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        if self.progress and n:
+            self.progress(n)
+        return n
+
+
+def _decompress(raw, kind):
+    if kind == 'gzip':
+        return gzip.GzipFile(fileobj=raw)
+    if kind == 'bzip2':
+        return bz2.BZ2File(raw)
+    if kind == 'xz':
+        return lzma.LZMAFile(raw)
+    if kind == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstandard is required to read .zst files (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_size=READ_BLOCK)
+    raise ValueError(f"Unknown compression: {kind}")
+
+
+def _strip_compression_suffix(name):
+    base, ext = os.path.splitext(name)
+    if ext == '.tgz':
+        return base + '.tar'
+    return base if ext in COMPRESSED_EXTENSIONS else name
+
+
+def iter_sources(file_path, progress=None):
+    """Yield (name, binary stream) for every data source inside file_path.
+
+    Compressed files are decompressed on the fly and archives (zip, tar and
+    compressed tar) yield one stream per member, so nothing is extracted to
+    disk. progress, if given, is called with the number of compressed bytes
+    read from file_path.
+    """
+    kind = detect_format(file_path)
+    if kind == 'zip':
+        # Zip reads its central directory from the end and seeks between
+        # members, so progress is reported per member instead of per read
+        with zipfile.ZipFile(file_path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        yield f"{file_path}:{info.filename}", member
+                if progress:
+                    progress(info.compress_size)
+        return
+
+    with open(file_path, 'rb') as f:
+        raw = io.BufferedReader(_CountingReader(f, progress), READ_BLOCK)
+
+        if kind == 'tar':
+            stream = raw
+        elif kind is not None:
+            stream = io.BufferedReader(_decompress(raw, kind), READ_BLOCK)
+            if _sniff(stream.peek(512)[:512]) != 'tar':
+                yield f"{file_path}:{_strip_compression_suffix(os.path.basename(file_path))}", stream
+                return
+        else:
+            yield file_path, raw
+            return
+
+        # Streaming mode reads members strictly in order without seeking
+        with tarfile.open(fileobj=stream, mode='r|') as tf:
+            for member in tf:
+                if member.isfile():
+                    # Members of a streamed tar cannot seek; say so rather than fail a probe
+                    member_stream = _CountingReader(tf.extractfile(member), seekable=False)
+                    yield f"{file_path}:{member.name}", io.BufferedReader(member_stream, READ_BLOCK)
+
+
+def iter_stream_records(name, stream, encoding='utf-8', on_reject=None):
+    """Yield (source, record) pairs from one decompressed source stream.
+
+    JSON lines members are decoded like plain .txt files, combo lines
+    included; on_reject(name, line, line_number, error) receives the lines
+    that can't be used.
+    """
+    lower = name.lower()
+    if lower.endswith(('.sql', '.mybbsql')):
+        for table, record in SQLDumpParser(name, encoding=encoding, fileobj=stream):
+            yield f"{name}:{table}", record
+        return
+
+    if lower.endswith('.csv'):
+        for record in csv.DictReader(iter_lines(stream, encoding, READ_BLOCK)):
+            yield name, record
+    elif lower.endswith(('.txt', '.json', '.jsonl')):
+        for record in iter_jsonl_records(name, stream, on_reject):
+            yield name, record
+    else:
+        raise ValueError(f"Unsupported file type inside archive: {name}")
+
+
+def iter_compressed_chunks(file_path, chunk_size=10000, encoding='utf-8', progress=None, on_error=None, on_reject=None):
+    """Yield (source, records) chunks from a compressed file or archive.
+
+    on_error(name, exc) is called for members that cannot be read; the
+    remaining members are still processed. An archive that can't be read
+    past a member is reported under file_path. on_reject is passed on to
+    iter_stream_records.
+    """
+    sources = iter_sources(file_path, progress)
+    while True:
+        try:
+            name, stream = next(sources)
+        except StopIteration:
+            return
+        except READ_ERRORS as e:
+            if on_error is None:
+                raise
+            on_error(file_path, e)
+            return
+        records = []
+        try:
+            for source, record in iter_stream_records(name, stream, encoding, on_reject):
+                if records and source != records_source:
+                    yield records_source, records
+                    records = []
+                records_source = source
+                records.append(record)
+                if len(records) >= chunk_size:
+                    yield source, records
+                    records = []
+        except READ_ERRORS as e:
+            if on_error is None:
+                raise
+            on_error(name, e)
+        if records:
+            yield records_source, records
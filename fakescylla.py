@@ -0,0 +1,380 @@
+"""In-memory stand-in for a ScyllaDB cluster, used by the benchmark suite.
+
+FakeCluster/FakeSession implement the parts of the driver API this project
+uses (prepare, execute, execute_async, batches and table metadata) against a
+dict keyed by email, with configurable latency and failure injection. Values
+in batches go through the driver's real serialization, so client-side costs
+are measured the same way as against a live cluster.
+"""
+import random
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import SimpleNamespace
+
+from cassandra import ConsistencyLevel, OperationTimedOut, Unavailable, WriteTimeout, InvalidRequest
+from cassandra.cqltypes import BytesType, UTF8Type
+from cassandra.policies import WriteType
+from cassandra.protocol import ColumnMetadata, OverloadedErrorMessage
+from cassandra.query import BatchStatement, BoundStatement, PreparedStatement, SimpleStatement
+
+BASE_COLUMNS = ['email', 'username', 'first_name', 'last_name', 'phone_number', 'city', 'state', 'dob', 'source', 'data']
+INDEXED_COLUMNS = ['username', 'first_name', 'last_name', 'phone_number']
+# Columns of type blob across user_data and record_keys; everything else is text
+BLOB_COLUMNS = {'record', 'id'}
+KEYS_COLUMNS = ('id', 'source', 'keys')
+PROTOCOL_VERSION = 4
+
+_INSERT = re.compile(r"^\s*INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES", re.I | re.S)
+_SELECT = re.compile(r"^\s*SELECT\s+(.+?)\s+FROM\s+(\w+)(?:\s+WHERE\s+(\w+)\s*=\s*(\?|'((?:[^']|'')*)'))?(?:\s+LIMIT\s+(\d+))?", re.I | re.S)
+_ALTER_ADD = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+ADD\s+(\w+)", re.I)
+_ALTER_COMMENT = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+WITH\s+comment\s*=\s*'((?:[^']|'')*)'", re.I)
+
+
+@lru_cache(maxsize=None)
+def _row_type(columns):
+    # Rows come back as named tuples, like the driver's default row factory
+    return namedtuple('Row', columns, rename=True)
+
+
+def _make_failure(kind):
+    if kind == 'timeout':
+        return WriteTimeout("Fake write timeout", consistency=ConsistencyLevel.ONE,
+                            required_responses=1, received_responses=0, write_type=WriteType.BATCH)
+    if kind == 'client_timeout':
+        return OperationTimedOut(errors={}, last_host='fake')
+    if kind == 'unavailable':
+        return Unavailable("Fake unavailable", consistency=ConsistencyLevel.ONE,
+                           required_replicas=1, alive_replicas=0)
+    if kind == 'overloaded':
+        return OverloadedErrorMessage(0x1001, "Fake coordinator overloaded", None)
+    raise ValueError(f"Unknown failure kind: {kind}")
+
+
+class FakeResultSet(list):
+    def one(self):
+        return self[0] if self else None
+
+    @property
+    def current_rows(self):
+        return self
+
+
+class FakeResponseFuture:
+    """Minimal ResponseFuture: result(), callbacks and a single page"""
+
+    has_more_pages = False
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._error = None
+        self._callbacks = []
+        self._errbacks = []
+
+    def _set(self, result=None, error=None):
+        with self._lock:
+            self._result = result
+            self._error = error
+            self._event.set()
+            callbacks = self._errbacks if error is not None else self._callbacks
+        for fn, args, kwargs in callbacks:
+            fn(error if error is not None else result, *args, **kwargs)
+
+    def result(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def add_callback(self, fn, *args, **kwargs):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append((fn, args, kwargs))
+                return self
+        if self._error is None:
+            fn(self._result, *args, **kwargs)
+        return self
+
+    def add_errback(self, fn, *args, **kwargs):
+        with self._lock:
+            if not self._event.is_set():
+                self._errbacks.append((fn, args, kwargs))
+                return self
+        if self._error is not None:
+            fn(self._error, *args, **kwargs)
+        return self
+
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None,
+                      errback_args=(), errback_kwargs=None):
+        self.add_callback(callback, *callback_args, **(callback_kwargs or {}))
+        self.add_errback(errback, *errback_args, **(errback_kwargs or {}))
+
+    def start_fetching_next_page(self):
+        raise Exception("No more pages to fetch")
+
+
+class FakeSession:
+    """In-memory session with optional latency and random failures.
+
+    latency is the simulated round trip in seconds for every request,
+    failure_rate the probability that a write request (one INSERT or a whole
+    batch) fails, before any of it is applied, with one of failure_kinds
+    ('timeout', 'client_timeout', 'unavailable', 'overloaded').
+    """
+
+    def __init__(self, cluster, latency=0.0, prepare_latency=None, failure_rate=0.0,
+                 failure_kinds=('timeout',), seed=None, strict_schema=True):
+        self.cluster = cluster
+        self.keyspace = None
+        self.latency = latency
+        self.prepare_latency = latency if prepare_latency is None else prepare_latency
+        self.failure_rate = failure_rate
+        self.failure_kinds = failure_kinds
+        self.strict_schema = strict_schema
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._prepared = {}
+        self._async = ThreadPoolExecutor(max_workers=32, thread_name_prefix='fake-scylla')
+        self.stats = {'requests': 0, 'prepares': 0, 'rows_written': 0, 'failures': 0, 'bytes': 0}
+
+    # -- driver API ---------------------------------------------------------
+
+    def set_keyspace(self, keyspace):
+        self.keyspace = keyspace
+        self.cluster._keyspace(keyspace)
+
+    def prepare(self, query):
+        self._wait(self.prepare_latency)
+        query_string = query.query_string if isinstance(query, SimpleStatement) else query
+        match = _INSERT.match(query_string)
+        if match:
+            table, columns = match.group(1), [c.strip() for c in match.group(2).split(',')]
+        else:
+            match = _SELECT.match(query_string)
+            table = match.group(2) if match else 'user_data'
+            columns = [match.group(3)] if match and match.group(4) == '?' else []
+        self._check_columns(columns, table)
+        metadata = [ColumnMetadata(self.keyspace, table, c, BytesType if c in BLOB_COLUMNS else UTF8Type)
+                    for c in columns]
+        query_id = uuid.uuid5(uuid.NAMESPACE_OID, query_string).bytes
+        prepared = PreparedStatement(metadata, query_id, None, query_string, self.keyspace,
+                                     PROTOCOL_VERSION, None, None)
+        with self._lock:
+            self.stats['prepares'] += 1
+            self._prepared[query_id] = prepared
+        return prepared
+
+    def execute(self, query, parameters=None, timeout=None, **kwargs):
+        self._wait(self.latency)
+        return self._run(query, parameters)
+
+    def execute_async(self, query, parameters=None, timeout=None, **kwargs):
+        future = FakeResponseFuture()
+
+        def run():
+            self._wait(self.latency)
+            try:
+                future._set(result=self._run(query, parameters))
+            except Exception as e:
+                future._set(error=e)
+
+        self._async.submit(run)
+        return future
+
+    def shutdown(self):
+        self._async.shutdown(wait=False)
+
+    # -- internals ----------------------------------------------------------
+
+    def _wait(self, seconds):
+        if seconds:
+            time.sleep(seconds)
+
+    def _check_columns(self, columns, table='user_data'):
+        if not self.strict_schema or not self.keyspace or table != 'user_data':
+            return
+        known = self.cluster._table(self.keyspace).columns
+        for column in columns:
+            if column not in known:
+                raise InvalidRequest(f"Error from server: code=2200 [Invalid query] message=\"Undefined column name {column}\"")
+
+    def _maybe_fail(self):
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            with self._lock:
+                self.stats['failures'] += 1
+            raise _make_failure(self._rng.choice(self.failure_kinds))
+
+    def _run(self, query, parameters):
+        with self._lock:
+            self.stats['requests'] += 1
+        if isinstance(query, BatchStatement):
+            # A batch fails as a whole, before any of its rows are applied
+            self._maybe_fail()
+            rows = []
+            for is_prepared, statement, values in query._statements_and_parameters:
+                if is_prepared:
+                    prepared = self._prepared[statement]
+                    rows.append((prepared.query_string, self._decode(prepared, values)))
+                else:
+                    rows.append((statement, None))
+            for query_string, values in rows:
+                self._apply(query_string, values)
+            return FakeResultSet()
+        if isinstance(query, BoundStatement):
+            query_string = query.prepared_statement.query_string
+            values = self._decode(query.prepared_statement, query.values)
+        elif isinstance(query, PreparedStatement):
+            query_string, values = query.query_string, list(parameters or ())
+        else:
+            query_string = query.query_string if isinstance(query, SimpleStatement) else query
+            values = list(parameters or ())
+        if _INSERT.match(query_string):
+            self._maybe_fail()
+        return self._apply(query_string, values)
+
+    def _decode(self, prepared, values):
+        return [None if v is None else meta.type.deserialize(v, PROTOCOL_VERSION)
+                for meta, v in zip(prepared.column_metadata, values)]
+
+    def _apply(self, query_string, values):
+        match = _INSERT.match(query_string)
+        if match:
+            columns = [c.strip() for c in match.group(2).split(',')]
+            self._check_columns(columns, match.group(1))
+            if match.group(1) == 'record_keys':
+                row = dict(zip(columns, values))
+                self.cluster._keys(self.keyspace)[row['id']] = row
+            else:
+                self.cluster._store(self.keyspace).insert(dict(zip(columns, values)))
+            with self._lock:
+                self.stats['rows_written'] += 1
+                self.stats['bytes'] += sum(len(v) for v in values if v)
+            return FakeResultSet()
+
+        match = _SELECT.match(query_string)
+        if match:
+            what, table, field, placeholder, literal, limit = match.groups()
+            if table == 'record_keys':
+                row = self.cluster._keys(self.keyspace).get(values[0])
+                row_type = _row_type(KEYS_COLUMNS)
+                return FakeResultSet([row_type(*(row.get(c) for c in KEYS_COLUMNS))] if row else [])
+            store = self.cluster._store(self.keyspace)
+            if 'COUNT(' in what.upper():
+                return FakeResultSet([(len(store.rows),)])
+            if field is None:
+                rows = list(store.rows.values())
+            else:
+                value = values[0] if placeholder == '?' else literal.replace("''", "'")
+                if field != 'email' and field not in INDEXED_COLUMNS:
+                    raise InvalidRequest("Error from server: code=2200 [Invalid query] message=\"Cannot execute this "
+                                         "query as it might involve data filtering and thus may have unpredictable "
+                                         "performance. If you want to execute this query despite the performance "
+                                         "unpredictability, use ALLOW FILTERING\"")
+                rows = store.lookup(field, value)
+            if limit:
+                rows = rows[:int(limit)]
+            columns = tuple(self.cluster._table(self.keyspace).columns)
+            row_type = _row_type(columns)
+            return FakeResultSet(row_type(*(row.get(c) for c in columns)) for row in rows)
+
+        match = _ALTER_ADD.match(query_string)
+        if match:
+            columns = self.cluster._table(self.keyspace).columns
+            if match.group(2) in columns:
+                raise InvalidRequest(f"Invalid column name {match.group(2)} because it conflicts with an existing column")
+            columns[match.group(2)] = SimpleNamespace(name=match.group(2), cql_type='text')
+            return FakeResultSet()
+
+        match = _ALTER_COMMENT.match(query_string)
+        if match:
+            self.cluster._table(self.keyspace).options['comment'] = match.group(2).replace("''", "'")
+            return FakeResultSet()
+
+        # CREATE KEYSPACE/TABLE/INDEX, USE and other DDL are accepted as no-ops
+        return FakeResultSet()
+
+
+class _FakeStore:
+    def __init__(self):
+        self.rows = {}
+        self.indexes = {column: {} for column in INDEXED_COLUMNS}
+        self._lock = threading.Lock()
+
+    def insert(self, row):
+        email = row.get('email')
+        if not email:
+            raise InvalidRequest("Key may not be empty")
+        with self._lock:
+            existing = self.rows.get(email)
+            if existing is not None:
+                for column, index in self.indexes.items():
+                    if column in row and existing.get(column):
+                        index.get(existing[column], set()).discard(email)
+                existing.update(row)
+            else:
+                existing = self.rows[email] = dict(row)
+            for column, index in self.indexes.items():
+                if existing.get(column):
+                    index.setdefault(existing[column], set()).add(email)
+
+    def lookup(self, field, value):
+        with self._lock:
+            if field == 'email':
+                row = self.rows.get(value)
+                return [row] if row else []
+            return [self.rows[email] for email in self.indexes[field].get(value, ())]
+
+
+class FakeCluster:
+    """Cluster stand-in holding the in-memory tables and schema metadata"""
+
+    def __init__(self, **session_options):
+        self.session_options = session_options
+        host = SimpleNamespace(endpoint='fake', is_up=True)
+        self.metadata = SimpleNamespace(keyspaces={}, all_hosts=lambda: [host])
+        self._stores = {}
+        self._record_keys = {}
+
+    def connect(self, keyspace=None):
+        session = FakeSession(self, **self.session_options)
+        if keyspace:
+            session.set_keyspace(keyspace)
+        self.session = session
+        return session
+
+    def shutdown(self):
+        if hasattr(self, 'session'):
+            self.session.shutdown()
+
+    def _keyspace(self, keyspace):
+        if keyspace not in self.metadata.keyspaces:
+            columns = {c: SimpleNamespace(name=c, cql_type='text') for c in BASE_COLUMNS}
+            table = SimpleNamespace(name='user_data', columns=columns, options={'comment': ''})
+            self.metadata.keyspaces[keyspace] = SimpleNamespace(name=keyspace, tables={'user_data': table})
+            self._stores[keyspace] = _FakeStore()
+            self._record_keys[keyspace] = {}
+        return self.metadata.keyspaces[keyspace]
+
+    def _table(self, keyspace):
+        return self._keyspace(keyspace).tables['user_data']
+
+    def _store(self, keyspace):
+        self._keyspace(keyspace)
+        return self._stores[keyspace]
+
+    def _keys(self, keyspace):
+        self._keyspace(keyspace)
+        return self._record_keys[keyspace]
+
+
+def fake_scylla_app(keyspace='user_data', codec=None, **session_options):
+    """Build a main.ScyllaApp wired to a FakeCluster instead of a real one"""
+    from main import ScyllaApp
+
+    return ScyllaApp(keyspace=keyspace, cluster=FakeCluster(**session_options), codec=codec)
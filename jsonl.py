@@ -0,0 +1,166 @@
+"""Fast reader for JSON lines files.
+
+The file is read in large blocks cut at the last newline and each block
+is split into lines in one go. With more than one worker, blocks are
+decoded in worker processes, so the GIL doesn't serialize JSON decoding.
+orjson is used when it is installed. Lines that aren't JSON objects are
+tried as email:password combo lines. The remaining lines go to on_reject
+with their line number and the decode error. Block reads are reported as
+the 'read' stage and decoding, wherever it ran, as 'decode'.
+"""
+import json
+import os
+import re
+import time
+from collections import deque
+
+import metrics
+
+READ_BLOCK = 4 * 1024 * 1024
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_COMBO = re.compile(r'^([^\s:;|@]+@[^\s:;|]+\.[^\s:;|]+)[:;|](.*)$')
+
+
+def parse_combo(line):
+    """Return {'email', 'password'} for an email:password line, else None"""
+    match = _COMBO.match(line)
+    if match is None:
+        return None
+    return {'email': match.group(1), 'password': match.group(2)}
+
+
+def _loads(line):
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # orjson rejects invalid UTF-8 outright; json decodes it with
+            # replacement characters like the text readers do
+            pass
+    return json.loads(line.decode('utf-8', errors='replace'))
+
+
+def decode_block(block, first_line):
+    """Decode a block of complete lines; returns (records, rejects, seconds).
+
+    rejects holds (line_number, text, error) for lines that are neither
+    JSON objects nor combo lines. seconds is the time spent decoding, so
+    callers can report it even when this ran in a worker process.
+    """
+    start = time.perf_counter()
+    records = []
+    rejects = []
+    for i, line in enumerate(block.split(b'\n')):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = _loads(line)
+            error = None if isinstance(record, dict) else f"JSON {type(record).__name__}, not an object"
+        except ValueError as e:
+            error = str(e)
+        if error is None:
+            records.append(record)
+            continue
+        text = line.decode('utf-8', errors='replace')
+        record = parse_combo(text)
+        if record is not None:
+            records.append(record)
+        else:
+            rejects.append((first_line + i, text, error))
+    return records, rejects, time.perf_counter() - start
+
+
+def _read_blocks(f, progress=None):
+    """Yield (block, first line number) runs of complete lines from binary stream f"""
+    line_number = 1
+    rest = b''
+    while True:
+        with metrics.stage('read'):
+            data = f.read(READ_BLOCK)
+        if not data:
+            break
+        if progress:
+            progress(len(data))
+        end = data.rfind(b'\n')
+        if end == -1:
+            rest += data
+            continue
+        block = rest + data[:end]
+        rest = data[end + 1:]
+        yield block, line_number
+        line_number += block.count(b'\n') + 1
+    if rest:
+        yield rest, line_number
+
+
+def _iter_blocks(file_path, progress=None):
+    with open(file_path, 'rb') as f:
+        yield from _read_blocks(f, progress)
+
+
+def _decoded_blocks(blocks, workers):
+    if workers <= 1:
+        for block, first_line in blocks:
+            yield decode_block(block, first_line)
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: the ingest process runs threads, which don't mix with fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        for block, first_line in blocks:
+            pending.append(pool.submit(decode_block, block, first_line))
+            # A couple of blocks per worker keeps them busy without
+            # buffering the whole file
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _report(name, rejects, seconds, on_reject):
+    metrics.observe_stage('decode', seconds)
+    if on_reject:
+        for line_number, line, error in rejects:
+            on_reject(name, line, line_number, error)
+
+
+def iter_jsonl_records(name, f, on_reject=None):
+    """Yield the records of JSON lines stream f, decoding in the calling thread.
+
+    For streams that aren't files on disk, such as archive members;
+    on_reject is called as in iter_jsonl_chunks with name as the source.
+    """
+    for block, first_line in _read_blocks(f):
+        records, rejects, seconds = decode_block(block, first_line)
+        _report(name, rejects, seconds, on_reject)
+        yield from records
+
+
+def iter_jsonl_chunks(file_path, chunk_size=10000, workers=None, progress=None, on_reject=None):
+    """Yield (file_path, records) chunks from a JSON lines file.
+
+    workers defaults to the CPU count; 1 decodes in the calling thread.
+    progress is called with the number of bytes read, and
+    on_reject(file_path, line, line_number, error) with lines that can't
+    be used.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    records = []
+    for decoded, rejects, seconds in _decoded_blocks(_iter_blocks(file_path, progress), workers):
+        _report(file_path, rejects, seconds, on_reject)
+        records.extend(decoded)
+        while len(records) >= chunk_size:
+            yield file_path, records[:chunk_size]
+            records = records[chunk_size:]
+    if records:
+        yield file_path, records
@@ -0,0 +1,166 @@
+"""Seeded generator of synthetic leak files for benchmarks.
+
+Produces CSV dumps (with the messy headers, quoting and missing values seen
+in real leaks), email:password combo lists and JSON lines files of any size.
+The same seed always produces the same file.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import string
+
+FIRST_NAMES = ['James', 'Mary', 'Wei', 'Fatima', 'Olga', 'José', 'Aiko', 'Liam', 'Noah', 'Emma',
+               'Chloé', 'Mohammed', 'Priya', 'Sven', 'Zoë', 'Ivan', 'Sara', 'Kenji', 'Lucas', 'Amara']
+LAST_NAMES = ['Smith', 'García', 'Müller', 'Nguyen', 'Kowalski', 'Silva', 'Tanaka', 'Brown', 'Okafor',
+              "O'Brien", 'Rossi', 'Ivanova', 'Hansen', 'Khan', 'Dubois', 'Lee', 'Novak', 'Jones']
+DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'mail.ru', 'gmx.de', 'proton.me', 'qq.com']
+CITIES = [('Springfield', 'IL'), ('Austin', 'TX'), ('Portland', 'OR'), ('Miami', 'FL'), ('Denver', 'CO'),
+          ('Boston', 'MA'), ('Seattle', 'WA'), ('Phoenix', 'AZ')]
+# Header spellings the ingest mapping has to cope with
+HEADER_VARIANTS = {
+    'email': ['email', 'Email', 'e-mail', 'mail'],
+    'username': ['username', 'user', 'login'],
+    'first_name': ['first_name', 'fname', 'FirstName'],
+    'last_name': ['last_name', 'lname', 'LastName'],
+    'phone_number': ['phone', 'phone_number', 'telephone'],
+    'password': ['password', 'pass', 'pwd'],
+    'city': ['city', 'City', 'town'],
+    'state': ['state', 'region'],
+    'dob': ['dob', 'date_of_birth', 'DOB'],
+}
+
+
+class LeakGenerator:
+    """Deterministic source of realistic-looking leak records"""
+
+    def __init__(self, seed=0, dirty=0.02, blob_size=0):
+        self.rng = random.Random(seed)
+        self.dirty = dirty
+        self.blob_size = blob_size
+
+    def _password(self):
+        rng = self.rng
+        kind = rng.random()
+        if kind < 0.3:
+            return ''.join(rng.choices(string.hexdigits.lower(), k=32))  # MD5
+        if kind < 0.4:
+            return '$2y$10$' + ''.join(rng.choices(string.ascii_letters + string.digits + './', k=53))
+        return rng.choice(LAST_NAMES).lower().replace("'", '') + str(rng.randint(0, 9999))
+
+    def record(self, i):
+        rng = self.rng
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        user = f"{first.lower()}.{last.lower().replace(chr(39), '')}{i}"
+        city, state = rng.choice(CITIES)
+        record = {
+            'email': f"{user}@{rng.choice(DOMAINS)}",
+            'username': user,
+            'first_name': first,
+            'last_name': last,
+            'phone_number': f"+1 ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+            'password': self._password(),
+            'city': city,
+            'state': state,
+            'dob': f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'ip': f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        }
+        if self.blob_size:
+            record['bio'] = ''.join(rng.choices(string.ascii_letters + ' ,"\n', k=self.blob_size))
+        if rng.random() < self.dirty:
+            # Dirty rows: missing email, stray separators or empty fields
+            choice = rng.random()
+            if choice < 0.5:
+                record['email'] = ''
+            elif choice < 0.8:
+                record['city'] = f"{city}, {state}"
+            else:
+                record['first_name'] = None
+        return record
+
+    def records(self, rows):
+        for i in range(rows):
+            yield self.record(i)
+
+
+def _rows_for_size(generator_fn, size):
+    """Estimate the row count that produces a file of roughly `size` bytes"""
+    sample = generator_fn(200)
+    return max(1, int(size / (len(sample) / 200)))
+
+
+def write_csv(path, rows, seed=0, dirty=0.02, blob_size=0):
+    gen = LeakGenerator(seed, dirty, blob_size)
+    rng = random.Random(seed + 1)
+    fields = list(HEADER_VARIANTS) + ['ip'] + (['bio'] if blob_size else [])
+    header = [rng.choice(HEADER_VARIANTS[f]) if f in HEADER_VARIANTS else f for f in fields]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for record in gen.records(rows):
+            writer.writerow([record[k] for k in fields])
+    return path
+
+
+def write_combo(path, rows, seed=0, dirty=0.02):
+    gen = LeakGenerator(seed, dirty)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in gen.records(rows):
+            separator = ';' if gen.rng.random() < dirty else ':'
+            f.write(f"{record['email']}{separator}{record['password']}\n")
+    return path
+
+
+def write_jsonl(path, rows, seed=0, dirty=0.02, blob_size=0):
+    gen = LeakGenerator(seed, dirty, blob_size)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in gen.records(rows):
+            if gen.rng.random() < dirty:
+                # Non-JSON noise lines, as found in concatenated dumps
+                f.write(f"{record['email']}:{record['password']}\n")
+                continue
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+
+WRITERS = {'csv': write_csv, 'combo': write_combo, 'jsonl': write_jsonl}
+EXTENSIONS = {'csv': '.csv', 'combo': '.txt', 'jsonl': '.txt'}
+
+
+def generate(kind, path, rows=None, size=None, seed=0, dirty=0.02, **options):
+    """Write a synthetic leak of `rows` rows (or about `size` bytes) to path"""
+    writer = WRITERS[kind]
+    if rows is None:
+        def sample(n):
+            tmp = f"{path}.sample"
+            writer(tmp, n, seed=seed, dirty=dirty, **options)
+            try:
+                with open(tmp, 'rb') as f:
+                    return f.read()
+            finally:
+                os.remove(tmp)
+        rows = _rows_for_size(sample, size or 10 * 1024 * 1024)
+    return writer(path, rows, seed=seed, dirty=dirty, **options)
+
+
+def _parse_size(text):
+    units = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    text = text.lower().rstrip('b')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic leak file")
+    parser.add_argument('kind', choices=sorted(WRITERS))
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int)
+    parser.add_argument('--size', type=_parse_size, help="Target size, e.g. 500M or 20G")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dirty', type=float, default=0.02, help="Fraction of malformed rows")
+    args = parser.parse_args()
+    generate(args.kind, args.path, rows=args.rows, size=args.size, seed=args.seed, dirty=args.dirty)
+    print(f"Wrote {args.path} ({os.path.getsize(args.path) / 1024 / 1024:.1f} MB)")
@@ -1,48 +1,74 @@
+# pandas, tkinter, tqdm, the driver and most of rich are imported by the commands
+# that need them, so a short search session doesn't pay for loading them all
 from concurrent.futures import ThreadPoolExecutor
 import os
-import pandas as pd
 import re
-from tkinter import Tk, filedialog, simpledialog, messagebox
-from tqdm import tqdm
 import csv
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.prompt import Prompt
-from rich import print as rprint
-from rich import box
-from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
-from cassandra.query import SimpleStatement, BatchStatement
-from cassandra.policies import TokenAwarePolicy, DCAwareRoundRobinPolicy
-from cassandra import ConsistencyLevel
 import asyncio
-import aiofiles
 import gc
-from datetime import datetime
-import json
-import multiprocessing
+from contextlib import nullcontext
+import time
+import metrics
+import aiodriver
+from rejects import RejectSink
+from recordcodec import RecordCodec
+from storage import StorageBackend, check_identifier
+from writes import AdaptiveBatcher, InflightLimiter, ResilientWriter, RetryPolicy, TokenBucket
+from sqldump import iter_dump_chunks
+from workbook import iter_workbook_chunks, workbook_dimensions
+from splitter import SNIFF_BYTES, is_wide_encoding, iter_range_chunks, line_numbers, read_header, sniff_sample, split_ranges
+from compressed import COMPRESSED_EXTENSIONS, detect_format, iter_compressed_chunks
+from jsonl import iter_jsonl_chunks
 console = Console()
 
 # ScyllaDB connection setup
-class ScyllaApp:
-    def __init__(self, contact_points=['localhost'], port=9042, keyspace='user_data'):
-    # Create a single execution profile with optimized settings
-     profile = ExecutionProfile(
-        load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
-        consistency_level=ConsistencyLevel.ONE,  # Using ONE for better performance
-        request_timeout=60
-     )
-
-     self.cluster = Cluster(
-        contact_points=contact_points,
-        port=port,
-        execution_profiles={EXEC_PROFILE_DEFAULT: profile},
-        protocol_version=4,
-        compression=True,
-        control_connection_timeout=10,
-        connect_timeout=10,
-        executor_threads=MAX_WORKERS  
-    )
+# Bump SCHEMA_VERSION and add the statements to SCHEMA_MIGRATIONS when the
+# schema changes. The version is kept in the table comment, which the driver
+# already has in its metadata after connecting, so an up to date schema costs
+# no requests at startup.
+SCHEMA_VERSION = 3
+SCHEMA_MIGRATIONS = {
+    # format_and_add_record and insert_batch write the password column
+    2: ["ALTER TABLE user_data ADD password text"],
+    # Packed records (recordcodec) and the key lists they refer to
+    3: [
+        "ALTER TABLE user_data ADD record blob",
+        "CREATE TABLE IF NOT EXISTS record_keys (id blob PRIMARY KEY, source text, keys text)",
+    ],
+}
+SELECT_QUERY = "SELECT * FROM user_data WHERE email = ?"
+KEYS_INSERT = "INSERT INTO record_keys (id, source, keys) VALUES (?, ?, ?)"
+KEYS_SELECT = "SELECT keys FROM record_keys WHERE id = ?"
+
+class ScyllaApp(StorageBackend):
+    def __init__(self, contact_points=['localhost'], port=9042, keyspace='user_data', cluster=None, codec=None):
+     self._prepared = {}
+     self._inserts = {}
+     self.codec = codec or RecordCodec()
+     if cluster is None:
+        from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+        from cassandra.policies import TokenAwarePolicy, DCAwareRoundRobinPolicy
+        from cassandra import ConsistencyLevel
+
+        # Create a single execution profile with optimized settings
+        profile = ExecutionProfile(
+            load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+            consistency_level=ConsistencyLevel.ONE,  # Using ONE for better performance
+            request_timeout=60
+        )
+        cluster = Cluster(
+            contact_points=contact_points,
+            port=port,
+            execution_profiles={EXEC_PROFILE_DEFAULT: profile},
+            protocol_version=4,
+            compression=True,
+            control_connection_timeout=10,
+            connect_timeout=10,
+            executor_threads=MAX_WORKERS
+        )
+     # An already built cluster (e.g. the benchmark's in-memory stand-in) can be injected
+     self.cluster = cluster
      try:
         self.session = self.cluster.connect()
         console.print("[green]Connected to ScyllaDB cluster[/green]")
@@ -50,11 +76,168 @@ class ScyllaApp:
         console.print(f"[red]Error connecting to ScyllaDB cluster: {str(e)}[/red]")
         raise
 
-     self.create_keyspace_if_not_exists(keyspace)
-     self.session.set_keyspace(keyspace)
-     self.create_table_if_not_exists()
-     self.create_indexes()
-     self.prepare_statements()
+     version = self.schema_version(keyspace)
+     # A newer build may have migrated further; leave its schema and version alone
+     if version >= SCHEMA_VERSION:
+        self.session.set_keyspace(keyspace)
+     else:
+        self.create_keyspace_if_not_exists(keyspace)
+        self.session.set_keyspace(keyspace)
+        self.migrate_schema(version)
+
+    def schema_version(self, keyspace):
+        """Return the schema version recorded on user_data, 0 if unknown"""
+        try:
+            table = self.cluster.metadata.keyspaces[keyspace].tables['user_data']
+            match = re.search(r'schema_version=(\d+)', table.options.get('comment') or '')
+            return int(match.group(1)) if match else 0
+        except (KeyError, AttributeError):
+            return 0
+
+    def migrate_schema(self, version):
+        """Bring user_data from `version` up to SCHEMA_VERSION and record it"""
+        if version < 1:
+            # Version 1 is the original table; IF NOT EXISTS makes it safe on
+            # clusters created before the version was recorded
+            self.create_table_if_not_exists()
+            self.create_indexes()
+        for step in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+            for statement in SCHEMA_MIGRATIONS[step]:
+                try:
+                    self.session.execute(statement)
+                except Exception as e:
+                    if "conflicts with an existing column" not in str(e):
+                        console.print(f"[red]Error migrating schema to version {step}: {str(e)}[/red]")
+                        raise
+        self.session.execute(f"ALTER TABLE user_data WITH comment = 'schema_version={SCHEMA_VERSION}'")
+        console.print(f"[green]Schema migrated to version {SCHEMA_VERSION}[/green]")
+
+    def prepare(self, query):
+        """Prepare query on first use and reuse the statement afterwards"""
+        statement = self._prepared.get(query)
+        if statement is None:
+            with metrics.stage('prepare'):
+                statement = self._prepared[query] = self.session.prepare(query)
+        return statement
+
+    async def prepare_async(self, query):
+        """prepare() for coroutines; the first, blocking prepare runs in the executor"""
+        statement = self._prepared.get(query)
+        if statement is None:
+            statement = await asyncio.get_running_loop().run_in_executor(None, self.prepare, query)
+        return statement
+
+    @property
+    def select_stmt(self):
+        return self.prepare(SELECT_QUERY)
+
+    def insert_statement(self, columns):
+        """Prepared upsert for a tuple of column names"""
+        statement = self._inserts.get(columns)
+        if statement is None:
+            statement = self._inserts[columns] = self.prepare(self._insert_query(columns))
+        return statement
+
+    def _insert_query(self, columns):
+        return f"INSERT INTO user_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    # StorageBackend interface
+
+    def columns(self):
+        return set(self.cluster.metadata.keyspaces[self.session.keyspace].tables['user_data'].columns)
+
+    def add_column(self, name):
+        self.session.execute(f"ALTER TABLE user_data ADD {check_identifier(name)} text")
+
+    def _batch(self, rows):
+        from cassandra.query import BatchStatement
+
+        batch = BatchStatement()
+        # Upserts of fixed values, so the driver and ResilientWriter may retry them
+        batch.is_idempotent = True
+        for row in rows:
+            batch.add(self.insert_statement(tuple(row)), tuple(row.values()))
+        # Key lists ride along with the first batches whose records use them
+        keys = self.codec.pending() if rows else []
+        for key in keys:
+            batch.add(self.prepare(KEYS_INSERT), key)
+        return batch, [key_id for key_id, _, _ in keys]
+
+    def insert_batch(self, rows):
+        batch, key_ids = self._batch(rows)
+        if len(batch):
+            self.session.execute(batch)
+            self.codec.saved(key_ids)
+
+    def _learn_keys(self, key_id, result):
+        for row in result:
+            self.codec.learn(key_id, row.keys)
+
+    def _rows(self, result):
+        rows = [row._asdict() for row in result]
+        for key_id in self.codec.missing(rows):
+            self._learn_keys(key_id, self.session.execute(self.prepare(KEYS_SELECT), (key_id,)))
+        return [self.codec.decode_row(row) for row in rows]
+
+    async def _rows_async(self, result):
+        rows = [row._asdict() for row in result]
+        for key_id in self.codec.missing(rows):
+            self._learn_keys(key_id, await aiodriver.execute(self.session, await self.prepare_async(KEYS_SELECT), (key_id,)))
+        return [self.codec.decode_row(row) for row in rows]
+
+    def get(self, email):
+        return self._rows(self.session.execute(self.select_stmt, (email,)))
+
+    def _lookup_query(self, field, limit):
+        if field == 'email':
+            return SELECT_QUERY
+        query = f"SELECT * FROM user_data WHERE {check_identifier(field)} = ?"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return query
+
+    def lookup(self, field, value, limit=None):
+        if field == 'email':
+            return self.get(value)
+        return self._rows(self.session.execute(self.prepare(self._lookup_query(field, limit)), (value,)))
+
+    def scan(self, limit=None):
+        query = "SELECT * FROM user_data"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        # The driver fetches further pages as the result is iterated
+        for row in self.session.execute(query):
+            yield from self._rows((row,))
+
+    def count(self):
+        return self.session.execute("SELECT COUNT(*) FROM user_data").one()[0]
+
+    def hosts(self):
+        return [host for host in self.cluster.metadata.all_hosts() if host.is_up]
+
+    # Native async requests: awaited on the running loop, no thread per call
+
+    async def add_column_async(self, name):
+        await aiodriver.execute(self.session, f"ALTER TABLE user_data ADD {check_identifier(name)} text")
+
+    async def insert_batch_async(self, rows):
+        # Prepare what _batch needs up front so it only hits the cache
+        for columns in {tuple(row) for row in rows}:
+            await self.prepare_async(self._insert_query(columns))
+        if rows and self.codec.pending():
+            await self.prepare_async(KEYS_INSERT)
+        batch, key_ids = self._batch(rows)
+        if len(batch):
+            await aiodriver.execute(self.session, batch)
+            self.codec.saved(key_ids)
+
+    async def lookup_async(self, field, value, limit=None):
+        statement = await self.prepare_async(self._lookup_query(field, limit))
+        return await self._rows_async(await aiodriver.execute(self.session, statement, (value,)))
+
+    async def count_async(self):
+        rows = await aiodriver.execute(self.session, "SELECT COUNT(*) FROM user_data")
+        return rows[0][0]
 
 
     def close(self):
@@ -107,32 +290,21 @@ class ScyllaApp:
         except Exception as e:
             console.print(f"[red]Error creating table: {str(e)}[/red]")
 
-    def prepare_statements(self):
-        try:
-            self.insert_stmt = self.session.prepare("""
-                INSERT INTO user_data (email, username, first_name, last_name, phone_number, city, state, dob, source, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """)
-            self.select_stmt = self.session.prepare("SELECT * FROM user_data WHERE email = ?")
-            console.print("[green]Prepared statements created[/green]")
-        except Exception as e:
-            console.print(f"[red]Error preparing statements: {str(e)}[/red]")
-            raise
-
     def count_total_rows(self, table_name):
         try:
-            query = f"SELECT COUNT(*) FROM {table_name}"
-            result = self.session.execute(query)
-            count = result.one()[0]
+            count = self.count()
             console.print(f"[green]Total number of rows in {table_name}: {count}[/green]")
             return count
         except Exception as e:
             console.print(f"[red]Error counting rows in {table_name}: {str(e)}[/red]")
             return None
 
-    def insert_data_in_batches(self, data, batch_size=1000):
-        for i in range(0, len(data), batch_size):
-            batch = BatchStatement()
-            for record in data[i:i + batch_size]:
+    def insert_data_in_batches(self, data, batch_size=None):
+        i = 0
+        while i < len(data):
+            size = batch_size or BATCHING.batch_size
+            batch = []
+            for record in data[i:i + size]:
                 email = record.get('email')
                 username = record.get('username')
                 first_name = record.get('first_name')
@@ -141,19 +313,23 @@ class ScyllaApp:
 
                 # Ensure email is present
                 if not email:
-                    console.print("[yellow]Skipping record due to missing email[/yellow]")
+                    REJECTS.reject(record, record.get('source'), 'missing_email')
                     continue
 
-                try:
-                    batch.add(self.insert_stmt, (email, username, first_name, last_name, phone_number, record.get('city'), record.get('state'), record.get('dob'), record.get('source'), record.get('data')))
-                except Exception as e:
-                    console.print(f"[red]Error adding record to batch: {e}[/red]")
-                    console.print(f"[yellow]Problematic record: {record}[/yellow]")
+                batch.append({
+                    'email': email, 'username': username, 'first_name': first_name, 'last_name': last_name,
+                    'phone_number': phone_number, 'city': record.get('city'), 'state': record.get('state'),
+                    'dob': record.get('dob'), 'source': record.get('source'), 'data': record.get('data'),
+                })
 
+            i += size
             try:
-                self.session.execute(batch)
+                with metrics.stage('execute'):
+                    WRITER.write(self, batch)
+                metrics.BATCHES.labels('ok').inc()
             except Exception as e:
-                console.print(f"[red]Error executing batch: {e}[/red]")
+                metrics.BATCHES.labels('error').inc()
+                REJECTS.reject_many(batch, None, 'batch_failed', error=str(e))
 
 # Helper functions for detecting patterns in data
 def detect_phone_number(cell_value):
@@ -194,7 +370,12 @@ def detect_name(cell_value):
     return None
 
 def convert_to_string(value):
-    if pd.isna(value):
+    # Same result as pd.isna for None, NaN, NaT and pd.NA (which refuses
+    # bool()), without loading pandas for readers that don't use it
+    try:
+        if value is None or value != value:
+            return ''
+    except TypeError:
         return ''
     return str(value)
 
@@ -206,6 +387,8 @@ def get_value_from_record(record, possible_keys):
     return ''
 
 def confirm_partition(file_path, threshold_kb=150000):
+    from rich.prompt import Prompt
+
     file_size_kb = os.path.getsize(file_path) / 1024
     if file_size_kb > threshold_kb:
         return Prompt.ask(
@@ -217,6 +400,8 @@ def confirm_partition(file_path, threshold_kb=150000):
 
 def read_malformed_csv(file_path, delimiter=',', chunksize=None):
     """Read CSV file with support for chunked reading and multiple encodings"""
+    import pandas as pd
+
     cleaned_data = []
     encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252', 'utf-16', 'utf-32']
     
@@ -258,6 +443,8 @@ def read_malformed_csv(file_path, delimiter=',', chunksize=None):
 
 def read_malformed_csv(file_path, delimiter=',', chunksize=None):
     """Read CSV file with support for chunked reading and multiple encodings"""
+    import pandas as pd
+
     cleaned_data = []
     encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252', 'utf-16', 'utf-32']
     
@@ -299,8 +486,21 @@ def read_malformed_csv(file_path, delimiter=',', chunksize=None):
 
 async def process_file(file_path, scylla_app, executor):
     """Process file with chunked reading for large files"""
+    from tqdm import tqdm
+
     try:
-        if file_path.endswith('.csv'):
+        # Workbooks are zip containers too, so only sniff other files
+        if not file_path.endswith(('.xlsx', '.xlsm')) and detect_format(file_path):
+            with tqdm(total=os.path.getsize(file_path), desc=f"Reading {file_path}", unit="B", unit_scale=True) as pbar:
+                chunks = iter_compressed_chunks(
+                    file_path,
+                    chunk_size=10000,
+                    progress=_read_progress(pbar),
+                    on_error=lambda name, e: console.print(f"[yellow]Skipping {name}: {e}[/yellow]"),
+                    on_reject=_reject_line
+                )
+                await ingest_chunks(chunks, scylla_app, executor)
+        elif file_path.endswith('.csv'):
             file_size = os.path.getsize(file_path)
             
             # Use chunked reading for large files (> 100MB)
@@ -312,45 +512,120 @@ async def process_file(file_path, scylla_app, executor):
                     chunksize=10000  # Corrected argument name
                 )
                 
-                for chunk in df_iterator:
-                    records = chunk.to_dict(orient='records')
-                    await insert_records_in_batches(records, file_path, scylla_app, executor=executor)
+                with tqdm(desc=f"Processing {file_path}", unit="records") as pbar:
+                    row = 1
+                    while True:
+                        with metrics.stage('parse'):
+                            chunk = next(df_iterator, None)
+                        if chunk is None:
+                            break
+                        records = chunk.to_dict(orient='records')
+                        await insert_records_in_batches(
+                            records, file_path, scylla_app, executor=executor, pbar=pbar, offsets=range(row, row + len(records))
+                        )
+                        row += len(records)
             else:
                 # Read entire file at once for smaller files
-                df = await asyncio.get_event_loop().run_in_executor(executor, read_malformed_csv, file_path)
+                with metrics.stage('parse'):
+                    df = await asyncio.get_event_loop().run_in_executor(executor, read_malformed_csv, file_path)
                 records = df.to_dict(orient='records')
-                await insert_records_in_batches(records, file_path, scylla_app, executor=executor)
+                await insert_records_in_batches(records, file_path, scylla_app, executor=executor, offsets=range(1, len(records) + 1))
+            metrics.BYTES_READ.inc(file_size)
                 
         elif file_path.endswith('.txt'):
-            async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-                records = []
-                async for line in file:
-                    try:
-                        record = json.loads(line)
-                        records.append(record)
-                        if len(records) >= 10000:  # Process in chunks
-                            await insert_records_in_batches(records, file_path, scylla_app, executor=executor)
-                            records = []
-                    except json.JSONDecodeError:
-                        continue
-                
-                # Process remaining records
-                if records:
-                    await insert_records_in_batches(records, file_path, scylla_app, executor=executor)
+            # JSON lines, with email:password combo lines mixed in
+            with tqdm(total=os.path.getsize(file_path), desc=f"Reading {file_path}", unit="B", unit_scale=True) as pbar:
+                chunks = iter_jsonl_chunks(
+                    file_path,
+                    chunk_size=10000,
+                    workers=JSONL_WORKERS,
+                    progress=_read_progress(pbar),
+                    on_reject=_reject_line
+                )
+                await ingest_chunks(chunks, scylla_app, executor)
+        elif file_path.endswith(('.sql', '.mybbsql')):
+            file_size = os.path.getsize(file_path)
+            with tqdm(total=file_size, desc=f"Reading {file_path}", unit="B", unit_scale=True) as pbar:
+                chunks = (
+                    (f"{file_path}:{table}", records)
+                    for table, records in iter_dump_chunks(file_path, chunk_size=10000, progress=_read_progress(pbar))
+                )
+                await ingest_chunks(chunks, scylla_app, executor)
+        elif file_path.endswith(('.xlsx', '.xlsm')):
+            total_rows = sum(workbook_dimensions(file_path).values())
+            with tqdm(total=total_rows, desc=f"Reading {file_path}", unit="records") as pbar:
+                def sheet_chunks():
+                    for sheet, records in iter_workbook_chunks(file_path, chunk_size=10000):
+                        pbar.update(len(records))
+                        yield f"{file_path}:{sheet}", records
+                await ingest_chunks(sheet_chunks(), scylla_app, executor)
         else:
             console.print(f"[red]Unsupported file type: {file_path}[/red]")
             
     except Exception as e:
         console.print(f"[red]Error processing file {file_path}: {str(e)}[/red]")
         console.print("[yellow]Attempting to continue with next file...[/yellow]")
+def _reject_line(name, line, offset, error):
+    """on_reject callback for the JSON lines readers"""
+    metrics.RECORDS.labels('undecodable').inc()
+    REJECTS.reject(line, name, 'invalid_json', offset=offset, error=error)
+
+def _read_progress(pbar):
+    """Progress callback for the readers: advances pbar and the bytes read metric"""
+    def update(n):
+        pbar.update(n)
+        metrics.BYTES_READ.inc(n)
+    return update
+
+def _next_chunk(chunks):
+    """next(chunks), observing the time not spent in the reader's read/decode stages as parse"""
+    start = time.perf_counter()
+    nested = metrics.thread_stage_seconds()
+    chunk = next(chunks, None)
+    metrics.observe_stage('parse', time.perf_counter() - start - (metrics.thread_stage_seconds() - nested))
+    return chunk
+
+async def ingest_chunks(chunks, scylla_app, executor, pbar=None):
+    """Feed (source, records) chunks from a blocking reader into the batch inserter.
+
+    A chunk may also be (source, records, offsets) when the reader knows
+    the line of each record; otherwise records are numbered per source.
+    """
+    from tqdm import tqdm
+
+    loop = asyncio.get_event_loop()
+    own_pbar = pbar is None
+    if own_pbar:
+        pbar = tqdm(desc="Inserting", unit="records")
+    rows_seen = {}
+    try:
+        while True:
+            # Pull the next chunk off the event loop so parsing overlaps with inserts
+            chunk = await loop.run_in_executor(executor, _next_chunk, chunks)
+            if chunk is None:
+                break
+            if len(chunk) == 3:
+                source, records, offsets = chunk
+            else:
+                source, records = chunk
+                first = rows_seen.get(source, 1)
+                rows_seen[source] = first + len(records)
+                offsets = range(first, first + len(records))
+            await insert_records_in_batches(records, source, scylla_app, executor=executor, pbar=pbar, offsets=offsets)
+    finally:
+        if own_pbar:
+            pbar.close()
+
 async def load_all_files(scylla_app, executor):
+    from tkinter import Tk, filedialog
+
     root = Tk()
     root.withdraw()  # Hide the root window
     directory = filedialog.askdirectory(title="Select a directory")
     if directory:
         for root, _, files in os.walk(directory):
             for file in files:
-                if file.endswith(".csv") or file.endswith(".txt"):
+                if file.endswith(((".csv", ".txt", ".sql", ".mybbsql", ".xlsx", ".xlsm") + COMPRESSED_EXTENSIONS)):
                     file_path = os.path.join(root, file)
                     await process_file(file_path, scylla_app, executor)  # Pass executor here
     else:
@@ -361,21 +636,19 @@ async def insert_batch(batch, file_path, scylla_app, pbar, executor):
 
     # Fetch existing columns from the table
     try:
-        table_metadata = await asyncio.get_event_loop().run_in_executor(
-            executor, 
-            lambda: scylla_app.cluster.metadata.keyspaces[scylla_app.session.keyspace].tables['user_data']
-        )
-        existing_columns = set(table_metadata.columns.keys())
+        existing_columns = scylla_app.columns()
     except Exception as e:
         console.print(f"[red]Error fetching table metadata: {e}[/red]")
         return
 
-    # Split the batch into smaller batches if it exceeds the limit
-    max_statements_per_batch = 65535
+    # Split into write batches of the size the adaptive batcher currently
+    # picks, never above the protocol limit of 65535 statements
+    max_statements_per_batch = min(BATCHING.batch_size, 65535)
     sub_batches = [batch[i:i + max_statements_per_batch] for i in range(0, len(batch), max_statements_per_batch)]
 
     for sub_batch in sub_batches:
-        batch_stmt = BatchStatement()
+        rows = []
+        batched = []
         for record in sub_batch:
             try:
                 # Convert record to proper format with standard fields
@@ -390,21 +663,22 @@ async def insert_batch(batch, file_path, scylla_app, pbar, executor):
                     'state': convert_to_string(get_value_from_record(record, ['state', 'province', 'region', 'State'])),
                     'dob': convert_to_string(get_value_from_record(record, ['dob', 'date_of_birth', 'dateofbirth', 'birth_date', 'DOB'])),
                     'source': file_path,
-                    'data': json.dumps(record)  # Store complete record as JSON
                 }
 
                 # Ensure email is present
                 if not formatted_record['email']:
                     skipped_count += 1
+                    REJECTS.reject(record, file_path, 'missing_email')
                     continue
+                # Store the complete record, packed against the columns above
+                formatted_record['record'] = scylla_app.codec.encode(record, formatted_record)
 
                 # Add any new columns found in the record
                 for key in record.keys():
                     if key not in existing_columns and key not in formatted_record:
                         sanitized_key = re.sub(r'[^a-zA-Z0-9_]', '_', key.lower())
                         try:
-                            alter_query = f"ALTER TABLE user_data ADD {sanitized_key} text"
-                            await asyncio.get_event_loop().run_in_executor(executor, scylla_app.session.execute, alter_query)
+                            await scylla_app.add_column_async(sanitized_key)
                             existing_columns.add(sanitized_key)
                             formatted_record[sanitized_key] = convert_to_string(record[key])
                         except Exception as e:
@@ -412,97 +686,121 @@ async def insert_batch(batch, file_path, scylla_app, pbar, executor):
                                 console.print(f"[red]Error adding column '{sanitized_key}': {e}[/red]")
                             continue
 
-                # Prepare and execute the insert statement
-                columns = ', '.join(formatted_record.keys())
-                placeholders = ', '.join(['?'] * len(formatted_record))
-                insert_stmt = scylla_app.session.prepare(
-                    f"INSERT INTO user_data ({columns}) VALUES ({placeholders})"
-                )
-
-                batch_stmt.add(insert_stmt, tuple(formatted_record.values()))
+                rows.append(formatted_record)
+                batched.append(record)
 
             except Exception as e:
-                console.print(f"[red]Error processing record: {e}[/red]")
+                REJECTS.reject(record, file_path, 'invalid_record', error=str(e))
                 continue
 
         try:
-            await asyncio.get_event_loop().run_in_executor(executor, scylla_app.session.execute, batch_stmt)
+            metrics.INFLIGHT.inc()
+            with metrics.stage('execute'):
+                await WRITER.write_async(scylla_app, rows)
+            metrics.BATCHES.labels('ok').inc()
+            metrics.RECORDS.labels('written').inc(len(rows))
             pbar.update(len(sub_batch))
         except Exception as e:
-            console.print(f"[red]Error executing batch: {e}[/red]")
+            metrics.BATCHES.labels('error').inc()
+            REJECTS.reject_many(batched, file_path, 'batch_failed', error=str(e))
+        finally:
+            metrics.INFLIGHT.dec()
 
     if skipped_count > 0:
-        console.print(f"[yellow]Skipped {skipped_count} records due to missing email.[/yellow]")
+        metrics.RECORDS.labels('skipped').inc(skipped_count)
        
 MAX_WORKERS = 100000
-async def insert_records_in_batches(records, file_path, scylla_app, batch_size=1000, executor=None):
-    """Insert records in optimized batches with parallel processing"""
+async def insert_records_in_batches(records, file_path, scylla_app, batch_size=None, executor=None, pbar=None, offsets=None):
+    """Insert records in optimized batches with parallel processing.
+
+    BATCHING picks the rows per batch (unless batch_size fixes it) and how
+    many batches run at once, from the latency and size of earlier ones.
+    Progress goes to pbar when the caller already shows one, so nested
+    callers don't count the same records twice. offsets, parallel to
+    records, are the row or line numbers reported with rejects.
+    """
+    from tqdm import tqdm
+
     try:
-        chunks = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
         total_records = len(records)
         processed_records = 0
         
-        with tqdm(total=total_records, desc=f"Processing {file_path}", unit="records") as pbar:
-            # Process chunks concurrently in groups
-            for i in range(0, len(chunks), 10):  # Process 10 chunks at a time
-                current_chunks = chunks[i:i + 10]
-                tasks = []
-                
-                for chunk in current_chunks:
+        with (tqdm(total=total_records, desc=f"Processing {file_path}", unit="records") if pbar is None else nullcontext(pbar)) as pbar:
+            pending = set()
+            start = 0
+            while start < total_records or pending:
+                # Top up to as many batches in flight as the batcher allows
+                while start < total_records and len(pending) < BATCHING.concurrency:
+                    size = batch_size or BATCHING.batch_size
                     task = asyncio.create_task(
                         process_chunk(
-                            chunk=chunk,
+                            chunk=records[start:start + size],
                             file_path=file_path,
                             scylla_app=scylla_app,
-                            executor=executor  # Pass executor here
+                            executor=executor,  # Pass executor here
+                            offsets=None if offsets is None else offsets[start:start + size]
                         )
                     )
-                    tasks.append(task)
+                    pending.add(task)
+                    start += size
                 
-                # Wait for current group of chunks to complete
-                results = await asyncio.gather(*tasks)
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
                 
                 # Update progress
-                for processed_count in results:
+                for task in done:
+                    processed_count = task.result()
                     if isinstance(processed_count, int):
                         processed_records += processed_count
                         pbar.update(processed_count)
                 
     except Exception as e:
         console.print(f"[red]Error in batch insertion: {e}[/red]")
-async def process_chunk(chunk, file_path, scylla_app, executor):
+async def process_chunk(chunk, file_path, scylla_app, executor, offsets=None):
     """Process a single chunk of records using ThreadPoolExecutor"""
     try:
-        batch_stmt = BatchStatement()
+        rows = []
         processed_count = 0
+        batched = []
         
         # Process records in parallel
         futures = []
-        for record in chunk:
+        for i, record in enumerate(chunk):
             future = executor.submit(
                 format_and_add_record,
                 record,
                 file_path,
                 scylla_app,
-                batch_stmt
+                rows,
+                None if offsets is None else offsets[i]
             )
             futures.append(future)
         
         # Wait for all record processing to complete
-        for future in futures:
-            result = future.result()
-            if result:
-                processed_count += 1
+        with metrics.stage('map'):
+            for record, future in zip(chunk, futures):
+                result = await asyncio.wrap_future(future)
+                if result:
+                    processed_count += 1
+                    batched.append(record)
+        metrics.RECORDS.labels('skipped').inc(len(chunk) - processed_count)
         
-        # Execute batch
-        await asyncio.get_event_loop().run_in_executor(executor, scylla_app.session.execute, batch_stmt)
+        # Execute batch; WRITER retries transient failures and applies back pressure
+        metrics.INFLIGHT.inc()
+        try:
+            with metrics.stage('execute'):
+                await WRITER.write_async(scylla_app, rows)
+        finally:
+            metrics.INFLIGHT.dec()
+        metrics.BATCHES.labels('ok').inc()
+        metrics.RECORDS.labels('written').inc(processed_count)
         return processed_count
         
     except Exception as e:
-        console.print(f"[red]Error processing chunk: {e}[/red]")
+        metrics.BATCHES.labels('error').inc()
+        REJECTS.reject_many(batched, file_path, 'batch_failed', error=str(e))
         return 0
-def format_and_add_record(record, file_path, scylla_app, batch_stmt):
-    """Format and add a single record to the batch statement"""
+def format_and_add_record(record, file_path, scylla_app, rows, offset=None):
+    """Format a single record and add it to the rows of the batch"""
     try:
         formatted_record = {
             'email': convert_to_string(get_value_from_record(record, ['email', 'mail', 'e-mail address', 'e-mail', 'Email'])),
@@ -512,48 +810,63 @@ def format_and_add_record(record, file_path, scylla_app, batch_stmt):
             'phone_number': convert_to_string(get_value_from_record(record, ['phone_number', 'phone', 'telephone'])),
             'password': convert_to_string(get_value_from_record(record, ['password', 'pwd', 'pass'])),
             'source': file_path,
-            'data': json.dumps(record)
         }
         
         if not formatted_record['email']:
+            REJECTS.reject(record, file_path, 'missing_email', offset=offset)
             return False
+        formatted_record['record'] = scylla_app.codec.encode(record, formatted_record)
             
-        columns = ', '.join(formatted_record.keys())
-        placeholders = ', '.join(['?'] * len(formatted_record))
-        insert_stmt = scylla_app.session.prepare(
-            f"INSERT INTO user_data ({columns}) VALUES ({placeholders})"
-        )
-        
-        batch_stmt.add(insert_stmt, tuple(formatted_record.values()))
+        rows.append(formatted_record)
         return True
         
     except Exception as e:
-        console.print(f"[red]Error formatting record: {e}[/red]")
+        REJECTS.reject(record, file_path, 'invalid_record', offset=offset, error=str(e))
         return False
-def optimize_batch_size(file_size):
-    """Dynamically adjust batch size based on file size"""
-    if file_size > 1_000_000_000:  # 1GB
-        return 100000
-    elif file_size > 100_000_000:  # 100MB
-        return 200000
-    else:
-        return 5000
-
 async def process_large_file(file_path, scylla_app, executor):
     """Process large files with optimized memory usage"""
+    from tqdm import tqdm
+
     file_size = os.path.getsize(file_path)
-    batch_size = optimize_batch_size(file_size)
     
     try:
         if file_path.endswith('.csv'):
-            total_rows = sum(1 for _ in open(file_path)) - 1
-            with tqdm(total=total_rows, desc=f"Processing {file_path}") as pbar:
-                async for chunk in read_csv_chunks(file_path, chunksize=batch_size):
-                    await insert_records_in_batches(chunk, file_path, scylla_app, batch_size, executor)
-                    pbar.update(len(chunk))
+            with open(file_path, 'rb') as f:
+                encoding, dialect = sniff_sample(f.read(SNIFF_BYTES))
+            if is_wide_encoding(encoding):
+                console.print(f"[yellow]{file_path} is {encoding} and can't be split by byte offset; reading it in one pass[/yellow]")
+                await process_file(file_path, scylla_app, executor)
+                return
+            # Split the file into quote-aware byte ranges and ingest them
+            # concurrently instead of writing part files first
+            ranges = await asyncio.get_event_loop().run_in_executor(
+                executor, lambda: split_ranges(
+                    file_path, os.cpu_count() or 4, quotechar=dialect.quotechar or '"',
+                    log=lambda message: console.print(f"[yellow]{message}[/yellow]")
+                )
+            )
+            first_lines = await asyncio.get_event_loop().run_in_executor(
+                executor, line_numbers, file_path, [start for start, _ in ranges]
+            )
+            header_line = read_header(file_path)[0].decode(encoding, errors='replace')
+            fieldnames = next(csv.reader([header_line.rstrip('\r\n')], dialect))
+            with tqdm(total=file_size, desc=f"Reading {file_path}", unit="B", unit_scale=True) as pbar, \
+                    tqdm(desc="Inserting", unit="records") as records_pbar:
+                await asyncio.gather(*(
+                    ingest_chunks(
+                        ((file_path, records, lines) for records, lines in iter_range_chunks(
+                            file_path, start, end, fieldnames, chunk_size=10000, encoding=encoding,
+                            progress=_read_progress(pbar), dialect=dialect, first_line=first_line
+                        )),
+                        scylla_app,
+                        executor,
+                        pbar=records_pbar
+                    )
+                    for (start, end), first_line in zip(ranges, first_lines)
+                ))
     except Exception as e:
         console.print(f"[red]Error processing large file: {e}[/red]")
-def format_record(record, file_path, existing_columns):
+def format_record(record, file_path, existing_columns, codec):
     formatted_record = {
         'email': convert_to_string(get_value_from_record(record, ['email', 'mail', 'e-mail address', 'e-mail', 'Email'])),
         'username': convert_to_string(get_value_from_record(record, ['username', 'user_name', 'user', 'login'])),
@@ -564,12 +877,13 @@ def format_record(record, file_path, existing_columns):
         'state': convert_to_string(get_value_from_record(record, ['state', 'province', 'region'])),
         'dob': convert_to_string(get_value_from_record(record, ['dob', 'date_of_birth', 'birthdate'])),
         'source': file_path,
-        'data': json.dumps(record)  # Store complete record as JSON
     }
 
     # Ensure email is present
     if not formatted_record['email']:
         return None
+    # Store the complete record, packed against the columns above
+    formatted_record['record'] = codec.encode(record, formatted_record)
 
     # Add any new columns found in the record
     for key in record.keys():
@@ -579,15 +893,17 @@ def format_record(record, file_path, existing_columns):
 
     return formatted_record
 async def load_single_file(scylla_app, executor):
+    from tkinter import Tk, filedialog
+
     root = Tk()
     root.withdraw()
     file_path = filedialog.askopenfilename(
         title="Select a file",
-        filetypes=[("CSV Files", "*.csv"), ("Text Files", "*.txt")]
+        filetypes=[("CSV Files", "*.csv"), ("Text Files", "*.txt"), ("SQL Dumps", "*.sql *.mybbsql"), ("Excel Workbooks", "*.xlsx *.xlsm"), ("Compressed Files", "*.gz *.tgz *.bz2 *.zst *.xz *.zip *.tar")]
     )
     if file_path:
         file_size = os.path.getsize(file_path)
-        if file_size > 100_000_000:  # 100MB
+        if file_size > 100_000_000 and file_path.endswith('.csv'):  # 100MB
             await process_large_file(file_path, scylla_app, executor)
         else:
             await process_file(file_path, scylla_app, executor)
@@ -598,13 +914,12 @@ async def load_single_file(scylla_app, executor):
 async def update_table_schema(scylla_app, new_columns):
     """Update the table schema with new columns."""
     try:
-        table_metadata = scylla_app.cluster.metadata.keyspaces[scylla_app.session.keyspace].tables['user_data']
-        existing_columns = set(table_metadata.columns.keys())
+        existing_columns = scylla_app.columns()
         
         for column in new_columns:
             if column not in existing_columns:
                 try:
-                    await scylla_app.session.execute(f"ALTER TABLE user_data ADD {column} text")
+                    await scylla_app.add_column_async(column)
                     console.print(f"[green]Added new column: {column}[/green]")
                 except Exception as e:
                     if "Invalid column name" not in str(e):
@@ -614,44 +929,61 @@ async def update_table_schema(scylla_app, new_columns):
 
 async def read_csv_chunks(file_path, chunksize=10000):
     """Read CSV file in chunks asynchronously"""
+    import pandas as pd
+
     try:
         for chunk in pd.read_csv(file_path, chunksize=chunksize):
             yield chunk.to_dict(orient='records')
     except Exception as e:
         console.print(f"[red]Error reading CSV chunks: {e}[/red]")
-async def process_chunk(chunk, file_path, scylla_app, executor):
+async def process_chunk(chunk, file_path, scylla_app, executor, offsets=None):
     """Process a single chunk of records using ThreadPoolExecutor"""
     try:
-        batch_stmt = BatchStatement()
+        rows = []
         processed_count = 0
+        batched = []
         
         # Process records in parallel
         futures = []
-        for record in chunk:
+        for i, record in enumerate(chunk):
             future = executor.submit(
                 format_and_add_record,
                 record,
                 file_path,
                 scylla_app,
-                batch_stmt
+                rows,
+                None if offsets is None else offsets[i]
             )
             futures.append(future)
         
         # Wait for all record processing to complete
-        for future in futures:
-            result = future.result()
-            if result:
-                processed_count += 1
+        with metrics.stage('map'):
+            for record, future in zip(chunk, futures):
+                result = await asyncio.wrap_future(future)
+                if result:
+                    processed_count += 1
+                    batched.append(record)
+        metrics.RECORDS.labels('skipped').inc(len(chunk) - processed_count)
         
-        # Execute batch
-        await asyncio.get_event_loop().run_in_executor(executor, scylla_app.session.execute, batch_stmt)
+        # Execute batch; WRITER retries transient failures and applies back pressure
+        metrics.INFLIGHT.inc()
+        try:
+            with metrics.stage('execute'):
+                await WRITER.write_async(scylla_app, rows)
+        finally:
+            metrics.INFLIGHT.dec()
+        metrics.BATCHES.labels('ok').inc()
+        metrics.RECORDS.labels('written').inc(processed_count)
         return processed_count
         
     except Exception as e:
-        console.print(f"[red]Error processing chunk: {e}[/red]")
+        metrics.BATCHES.labels('error').inc()
+        REJECTS.reject_many(batched, file_path, 'batch_failed', error=str(e))
         return 0
 def read_malformed_csv(file_path, delimiter=',', chunksize=None):
     """Read CSV file with support for chunked reading and multiple encodings"""
+    import pandas as pd
+
     encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252', 'utf-16', 'utf-32']
     
     for encoding in encodings:
@@ -688,10 +1020,18 @@ def read_malformed_csv(file_path, delimiter=',', chunksize=None):
             continue
     
     raise UnicodeDecodeError(f"Unable to decode the file with any of these encodings: {encodings}")
+SEARCH_DISPLAY_COLUMNS = ['email', 'username', 'first_name', 'last_name', 'phone_number', 'city', 'state', 'dob', 'source']
+
+async def _lookup(scylla_app, field, value, max_results):
+    with metrics.stage('search'):
+        rows = await scylla_app.lookup_async(field, value, limit=max_results)
+    metrics.SEARCH_RESULTS.inc(len(rows))
+    return rows
+
 async def search_scylla(search_input, scylla_app, max_results=None):
-    await asyncio.to_thread(_search_scylla, search_input, scylla_app, max_results)
+    from rich.table import Table
+    from rich import box
 
-def _search_scylla(search_input, scylla_app, max_results=None):
     try:
         query_conditions = []
         
@@ -703,40 +1043,31 @@ def _search_scylla(search_input, scylla_app, max_results=None):
             if field in primary_and_alternative_keys:
                 # For email searches, we should be case-sensitive
                 if field == "email":
-                    query_conditions.append(f"{field} = '{value}'")
+                    query_conditions.append((field, value))
                 else:
-                    query_conditions.append(f"{field} = '{value}'")
-                    query_conditions.append(f"{field} = '{value.lower()}'")
-                    query_conditions.append(f"{field} = '{value.capitalize()}'")
-                    query_conditions.append(f"{field} = '{value.upper()}'")
+                    # Case variants that coincide are only looked up once
+                    for variant in dict.fromkeys([value, value.lower(), value.capitalize(), value.upper()]):
+                        query_conditions.append((field, variant))
 
-        # Construct and execute queries
+        # Look up every condition concurrently through the storage backend
+        for field, value in query_conditions:
+            console.print(f"[cyan]Looking up {field} = {value!r}[/cyan]")
+        lookups = await asyncio.gather(
+            *(_lookup(scylla_app, field, value, max_results) for field, value in query_conditions),
+            return_exceptions=True,
+        )
         results = []
-        for condition in query_conditions:
-            query = f"SELECT * FROM user_data WHERE {condition}"
-            if max_results:
-                query += f" LIMIT {max_results}"
-            
+        for (field, value), rows in zip(query_conditions, lookups):
+            query = f"{field} = {value!r}"
             try:
-                console.print(f"[cyan]Executing query: {query}[/cyan]")
-                rows = scylla_app.session.execute(query)
-                
+                if isinstance(rows, Exception):
+                    raise rows
+
                 # Process each row safely
                 for row in rows:
                     try:
-                        # Convert row to dictionary and handle None values
-                        row_dict = {
-                            'email': row.email,
-                            'username': row.username if hasattr(row, 'username') else None,
-                            'first_name': row.first_name if hasattr(row, 'first_name') else None,
-                            'last_name': row.last_name if hasattr(row, 'last_name') else None,
-                            'phone_number': row.phone_number if hasattr(row, 'phone_number') else None,
-                            'city': row.city if hasattr(row, 'city') else None,
-                            'state': row.state if hasattr(row, 'state') else None,
-                            'dob': row.dob if hasattr(row, 'dob') else None,
-                            'source': row.source if hasattr(row, 'source') else None
-                        }
-                        # Filter out None values
+                        # Keep the displayed columns and drop missing values
+                        row_dict = {k: row.get(k) for k in SEARCH_DISPLAY_COLUMNS}
                         row_dict = {k: v for k, v in row_dict.items() if v is not None}
                         results.append(row_dict)
                     except Exception as e:
@@ -761,53 +1092,121 @@ def _search_scylla(search_input, scylla_app, max_results=None):
     except Exception as e:
         console.print(f"[red]Error searching ScyllaDB: {str(e)}[/red]")
         if 'query' in locals():
-            console.print(f"[yellow]Query attempted: {query}[/yellow]")
+            console.print(f"[yellow]Lookup attempted: {query}[/yellow]")
     finally:
         gc.collect()
 
 
 async def load_multiple_files(scylla_app, executor):
+    from tkinter import Tk, filedialog
+
     root = Tk()
     root.withdraw()  # Hide the root window
-    file_paths = filedialog.askopenfilenames(title="Select files", filetypes=[("CSV Files", "*.csv"), ("Text Files", "*.txt")])
+    file_paths = filedialog.askopenfilenames(title="Select files", filetypes=[("CSV Files", "*.csv"), ("Text Files", "*.txt"), ("SQL Dumps", "*.sql *.mybbsql"), ("Excel Workbooks", "*.xlsx *.xlsm"), ("Compressed Files", "*.gz *.tgz *.bz2 *.zst *.xz *.zip *.tar")])
     if file_paths:
         for file_path in file_paths:
             await process_file(file_path, scylla_app, executor)  # Pass executor here
     else:
         console.print("[yellow]No files selected.[/yellow]")
+# Metrics export and one-shot profiling are configured from the environment:
+#   SCYLLA_METRICS_PORT  serve Prometheus metrics on this port
+#   SCYLLA_METRICS_FILE  rewrite this file with the metrics after every command
+#   SCYLLA_PROFILE       profile the first load/search command into this file
+#   SCYLLA_PROFILE_MODE  "cprofile" (default) or "sample" for collapsed stacks
+#   SCYLLA_REJECTS_FILE  append rejected records here (.gz/.zst are compressed)
+#   SCYLLA_BACKEND       "scylla" (default) or "sqlite" for a local database file
+#   SCYLLA_BATCH_TARGET_MS  write latency the adaptive batcher aims for (200)
+#   SCYLLA_BATCH_TARGET_KB  largest write batch payload it plans for (512)
+#   SCYLLA_WRITE_RATE       global write limit in rows per second (0 = unlimited)
+#   SCYLLA_MAX_INFLIGHT_PER_HOST  write batches in flight per live host (32)
+#   SCYLLA_WRITE_ATTEMPTS   tries per batch on timeouts/overload/unavailable (6)
+#   SCYLLA_SQLITE_PATH   database file of the sqlite backend (user_data.db)
+#   SCYLLA_RECORD_ZSTD   zstd level for stored records (unset = uncompressed)
+#   SCYLLA_JSONL_WORKERS processes decoding .txt JSON lines (CPU count, 1 = inline)
+METRICS_PORT = os.environ.get('SCYLLA_METRICS_PORT')
+METRICS_FILE = os.environ.get('SCYLLA_METRICS_FILE')
+PROFILE_PATH = os.environ.get('SCYLLA_PROFILE')
+PROFILE_MODE = os.environ.get('SCYLLA_PROFILE_MODE', 'cprofile')
+STORAGE_BACKEND = os.environ.get('SCYLLA_BACKEND', 'scylla')
+SQLITE_PATH = os.environ.get('SCYLLA_SQLITE_PATH', 'user_data.db')
+RECORD_ZSTD = os.environ.get('SCYLLA_RECORD_ZSTD')
+JSONL_WORKERS = int(os.environ['SCYLLA_JSONL_WORKERS']) if os.environ.get('SCYLLA_JSONL_WORKERS') else None
+BATCHING = AdaptiveBatcher(
+    target_latency=float(os.environ.get('SCYLLA_BATCH_TARGET_MS', 200)) / 1000,
+    target_bytes=int(os.environ.get('SCYLLA_BATCH_TARGET_KB', 512)) * 1024,
+)
+WRITER = ResilientWriter(
+    BATCHING,
+    retry=RetryPolicy(max_attempts=int(os.environ.get('SCYLLA_WRITE_ATTEMPTS', 6))),
+    bucket=TokenBucket(rate=float(os.environ.get('SCYLLA_WRITE_RATE', 0))),
+    limiter=InflightLimiter(per_host=int(os.environ.get('SCYLLA_MAX_INFLIGHT_PER_HOST', 32))),
+)
+REJECTS = RejectSink(os.environ.get('SCYLLA_REJECTS_FILE', 'rejects.jsonl.gz'), log=console.print)
+
+def open_backend():
+    """Open the storage backend selected by SCYLLA_BACKEND"""
+    codec = RecordCodec(int(RECORD_ZSTD) if RECORD_ZSTD else None)
+    if STORAGE_BACKEND == 'sqlite':
+        from storage import SQLiteBackend
+
+        console.print(f"[green]Using local SQLite database {SQLITE_PATH}[/green]")
+        return SQLiteBackend(SQLITE_PATH, codec=codec)
+    if STORAGE_BACKEND != 'scylla':
+        raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+    return ScyllaApp(contact_points=['localhost'], port=9042, keyspace='user_data', codec=codec)
+
 async def main():
-    scylla_app = ScyllaApp(contact_points=['localhost'], port=9042, keyspace='user_data')
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+
+    scylla_app = open_backend()
     executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    if METRICS_PORT:
+        metrics.serve(int(METRICS_PORT))
+        console.print(f"[green]Serving metrics on port {METRICS_PORT}[/green]")
+    profile_path = PROFILE_PATH
     
     while True:
         console.print(Panel.fit(
             "[bold cyan]Select mode:[/bold cyan]\n"
-            "1. Load a single file (CSV or TXT)\n"
-            "2. Load all files in a directory (CSV or TXT)\n"
-            "3. Load multiple selected files (CSV or TXT)\n"
+            "1. Load a single file (CSV, TXT, SQL dump or XLSX)\n"
+            "2. Load all files in a directory (CSV, TXT, SQL dump or XLSX)\n"
+            "3. Load multiple selected files (CSV, TXT, SQL dump or XLSX)\n"
             "4. Search ScyllaDB\n"
-            "5. Exit",
+            "5. Exit\n"
+            "6. Show metrics",
             title="ScyllaDB Data Manager",
             border_style="bold green"
         ))
         
         mode = Prompt.ask("Enter mode", choices=["1", "2", "3", "4", "5", "6"])
 
-        if mode == '1':
-            await load_single_file(scylla_app, executor)  # Pass executor here
-        elif mode == '2':
-            await load_all_files(scylla_app, executor)  # Pass executor here
-        elif mode == '3':
-            await load_multiple_files(scylla_app, executor)  # Pass executor here
-        elif mode == '4':
-            search_input = input("Enter search terms (e.g., \"email:example@gmail.com\" or \"first_name:John\"): ")
-            await search_scylla(search_input, scylla_app)
-        elif mode == '5':
-            console.print("[yellow]Exiting...[/yellow]")
-            break
-        else:
-            console.print("[red]Invalid mode selected. Please try again.[/red]")
+        profiling = profile_path is not None and mode in ('1', '2', '3', '4')
+        with metrics.profile_run(profile_path, PROFILE_MODE) if profiling else nullcontext():
+            if mode == '1':
+                await load_single_file(scylla_app, executor)  # Pass executor here
+            elif mode == '2':
+                await load_all_files(scylla_app, executor)  # Pass executor here
+            elif mode == '3':
+                await load_multiple_files(scylla_app, executor)  # Pass executor here
+            elif mode == '4':
+                search_input = input("Enter search terms (e.g., \"email:example@gmail.com\" or \"first_name:John\"): ")
+                await search_scylla(search_input, scylla_app)
+            elif mode == '5':
+                console.print("[yellow]Exiting...[/yellow]")
+                break
+            elif mode == '6':
+                console.print(metrics.render(), markup=False, highlight=False)
+            else:
+                console.print("[red]Invalid mode selected. Please try again.[/red]")
+        if profiling:
+            console.print(f"[green]Profile written to {profile_path}[/green]")
+            profile_path = None
+        REJECTS.flush()
+        if METRICS_FILE:
+            metrics.dump(METRICS_FILE)
 
+    REJECTS.close()
     scylla_app.close()
 
 if __name__ == "__main__":
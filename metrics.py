@@ -0,0 +1,353 @@
+"""Lightweight ingest/search metrics with a Prometheus text export.
+
+Counters, gauges and histograms live in a process wide registry. Updates
+are a dict lookup plus an add under a lock, and the pipeline records them
+per chunk or per request rather than per row, so the cost in the hot loop
+is negligible. Export with render(), dump(path) or serve(port).
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond parsing up to slow cluster timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+# Stage time observed per thread, so a caller can tell how much of a span
+# went to nested stages (see thread_stage_seconds)
+_thread_stages = threading.local()
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    """Exact text for a sample value or bucket bound; %g would round to 6 digits"""
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self._children[()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _Timer:
+    """Context manager observing the elapsed time into a histogram child"""
+
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.child.observe(elapsed)
+        _thread_stages.seconds = getattr(_thread_stages, 'seconds', 0.0) + elapsed
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def render(self, name, labelnames, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', _format_value(bound)))} {cumulative}")
+        cumulative += self.counts[-1]
+        lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', '+Inf'))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def _register(cls, name, documentation, labelnames=(), **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# Pipeline metrics shared by main.py and the readers
+STAGE_SECONDS = histogram('scylla_stage_seconds', 'Time spent per pipeline stage and call', ['stage'])
+RECORDS = counter('scylla_records_total', 'Records seen by the ingest pipeline', ['outcome'])
+BYTES_READ = counter('scylla_bytes_read_total', 'Input bytes consumed by the readers')
+BATCHES = counter('scylla_batches_total', 'Write batches executed', ['outcome'])
+INFLIGHT = gauge('scylla_inflight_batches', 'Write batches currently executing')
+REJECTS = counter('scylla_rejects_total', 'Records written to the reject sink', ['reason'])
+BATCH_SIZE = gauge('scylla_batch_size_rows', 'Rows per write batch chosen by the adaptive batcher')
+BATCH_CONCURRENCY = gauge('scylla_batch_concurrency', 'Write batches allowed in flight by the adaptive batcher')
+BATCH_ADJUSTMENTS = counter('scylla_batch_adjustments_total', 'Adaptive batcher decisions', ['knob', 'direction', 'reason'])
+BATCH_BYTES = histogram('scylla_batch_payload_bytes', 'Approximate payload size of write batches',
+                        buckets=(1024, 4096, 16384, 65536, 262144, 524288, 1048576, 4194304, 16777216))
+WRITE_RETRIES = counter('scylla_write_retries_total', 'Write batches retried, by failure kind', ['kind'])
+RATE_LIMIT_WAIT = counter('scylla_rate_limit_wait_seconds_total', 'Time writes waited for the token bucket')
+SEARCH_RESULTS = counter('scylla_search_results_total', 'Rows returned by search queries')
+
+
+def stage(name):
+    """Context manager timing one call of a pipeline stage"""
+    return STAGE_SECONDS.labels(name).time()
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    _thread_stages.seconds = getattr(_thread_stages, 'seconds', 0.0) + seconds
+
+
+def stage_seconds():
+    """Return {stage: total seconds observed} across all threads"""
+    return {values[0]: child.sum for values, child in list(STAGE_SECONDS._children.items())}
+
+
+def thread_stage_seconds():
+    """Total stage time observed so far by the calling thread"""
+    return getattr(_thread_stages, 'seconds', 0.0)
+
+
+def render():
+    """Return every registered metric in Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def dump(path):
+    """Write the current metrics to path (for node_exporter's textfile collector)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+def serve(port, host='0.0.0.0'):
+    """Serve /metrics from a daemon thread; returns the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics-http').start()
+    return server
+
+
+class SamplingProfiler:
+    """Low overhead wall-clock sampler writing collapsed stacks.
+
+    Every `interval` seconds the stacks of all other threads are recorded;
+    the output can be fed to flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='sampling-profiler')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_run(path, mode='cprofile'):
+    """Profile the enclosed block with cProfile (.prof) or the sampler (collapsed stacks).
+
+    cProfile only sees the calling thread; use mode='sample' to include the
+    executor threads that do the parsing and driver calls.
+    """
+    if mode == 'sample':
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            profiler.write(path)
+    else:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
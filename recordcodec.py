@@ -0,0 +1,221 @@
+"""Compact encoding for the complete record stored with every row.
+
+Rows used to carry json.dumps(record) in the data column, repeating every
+header name and every value already stored in the typed columns. The
+record column holds a packed blob instead:
+
+    flags (1 byte) | key list id (8 bytes) | body, zstd compressed if flagged
+
+The record's keys are interned as a key list per source; the blob only
+references it by id and the list itself is stored once in record_keys.
+The body holds one tag per key, in key order. A value equal to one of the
+typed columns written with the row is a one byte reference to it;
+everything else is packed in a small binary format. Decoding gives back
+the same JSON text json.dumps(record) produced, so readers don't notice.
+"""
+import hashlib
+import json
+import struct
+import threading
+
+# Typed columns a value may refer to; the order is part of the format
+REFERENCE_COLUMNS = ('email', 'username', 'first_name', 'last_name', 'phone_number', 'password', 'city', 'state', 'dob')
+
+_NONE, _FALSE, _TRUE, _STR, _INT, _NEG, _FLOAT, _JSON = range(8)
+_REFERENCE = 0x10
+_ZSTD = 0x01
+_ID_SIZE = 8
+# Smaller bodies don't shrink under zstd without a dictionary
+MIN_COMPRESS = 96
+
+_DOUBLE = struct.Struct('<d')
+_SMALL = [bytes((n,)) for n in range(0x80)]
+
+
+def _varint(n):
+    if n < 0x80:
+        return _SMALL[n]
+    out = bytearray()
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _read_varint(buf, i):
+    n = shift = 0
+    while True:
+        byte = buf[i]
+        i += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, i
+        shift += 7
+
+
+def _pack(value, parts):
+    if value is None:
+        parts.append(_SMALL[_NONE])
+    elif value is True:
+        parts.append(_SMALL[_TRUE])
+    elif value is False:
+        parts.append(_SMALL[_FALSE])
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        parts.append(_SMALL[_STR])
+        parts.append(_varint(len(data)))
+        parts.append(data)
+    elif isinstance(value, int):
+        parts.append(_SMALL[_INT] if value >= 0 else _SMALL[_NEG])
+        parts.append(_varint(abs(value)))
+    elif isinstance(value, float):
+        parts.append(_SMALL[_FLOAT])
+        parts.append(_DOUBLE.pack(value))
+    else:
+        # Lists, dicts and anything else json.dumps accepted before
+        data = json.dumps(value).encode('utf-8')
+        parts.append(_SMALL[_JSON])
+        parts.append(_varint(len(data)))
+        parts.append(data)
+
+
+def _unpack(buf, i, row):
+    tag = buf[i]
+    i += 1
+    if tag >= _REFERENCE:
+        return row.get(REFERENCE_COLUMNS[tag - _REFERENCE]), i
+    if tag == _STR:
+        n, i = _read_varint(buf, i)
+        return buf[i:i + n].decode('utf-8'), i + n
+    if tag == _INT or tag == _NEG:
+        n, i = _read_varint(buf, i)
+        return (n if tag == _INT else -n), i
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(buf, i)[0], i + _DOUBLE.size
+    if tag == _JSON:
+        n, i = _read_varint(buf, i)
+        return json.loads(buf[i:i + n].decode('utf-8')), i + n
+    if tag == _NONE:
+        return None, i
+    if tag == _TRUE:
+        return True, i
+    if tag == _FALSE:
+        return False, i
+    raise ValueError(f"Unknown record value tag {tag}")
+
+
+class RecordCodec:
+    """Encodes records to record blobs and back, caching the key lists.
+
+    compression_level enables zstd for bodies of MIN_COMPRESS bytes or
+    more; None stores them uncompressed. Key lists seen for the first
+    time stay pending until a backend reports them saved.
+    """
+
+    def __init__(self, compression_level=None):
+        self.compression_level = compression_level
+        self._ids = {}
+        self._keys = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if compression_level is not None:
+            self._zstd()
+
+    def _zstd(self):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstandard is required to compress records (pip install zstandard)")
+        return zstandard
+
+    def _compressor(self):
+        # zstd contexts are not thread safe; keep one per thread
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = self._zstd().ZstdCompressor(level=self.compression_level)
+        return compressor
+
+    def _decompressor(self):
+        decompressor = getattr(self._local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = self._zstd().ZstdDecompressor()
+        return decompressor
+
+    def _key_id(self, source, keys):
+        key_id = self._ids.get((source, keys))
+        if key_id is None:
+            digest = hashlib.blake2b(json.dumps([source, keys]).encode('utf-8'), digest_size=_ID_SIZE).digest()
+            with self._lock:
+                key_id = self._ids.setdefault((source, keys), digest)
+                if key_id not in self._keys:
+                    self._keys[key_id] = keys
+                    self._pending[key_id] = (source, json.dumps(keys))
+        return key_id
+
+    def encode(self, record, row):
+        """Pack record; values equal to row's typed columns become references"""
+        keys = tuple(record)
+        parts = [self._key_id(row.get('source'), keys)]
+        body = []
+        references = {row[column]: _REFERENCE + i for i, column in enumerate(REFERENCE_COLUMNS) if row.get(column)}
+        for value in record.values():
+            tag = references.get(value) if value.__class__ is str else None
+            if tag is not None:
+                body.append(_SMALL[tag])
+            else:
+                _pack(value, body)
+        body = b''.join(body)
+        flags = 0
+        if self.compression_level is not None and len(body) >= MIN_COMPRESS:
+            compressed = self._compressor().compress(body)
+            if len(compressed) < len(body):
+                body, flags = compressed, _ZSTD
+        parts.insert(0, _SMALL[flags])
+        parts.append(body)
+        return b''.join(parts)
+
+    def key_id(self, blob):
+        return bytes(blob[1:1 + _ID_SIZE])
+
+    def missing(self, rows):
+        """Key list ids referenced by rows that aren't cached yet"""
+        return {self.key_id(row['record']) for row in rows if row.get('record')} - self._keys.keys()
+
+    def learn(self, key_id, keys):
+        """Cache a key list loaded from record_keys (JSON array text)"""
+        with self._lock:
+            self._keys[key_id] = tuple(json.loads(keys))
+
+    def pending(self):
+        """Return [(key_id, source, keys)] for key lists not saved yet"""
+        with self._lock:
+            return [(key_id, source, keys) for key_id, (source, keys) in self._pending.items()]
+
+    def saved(self, key_ids):
+        with self._lock:
+            for key_id in key_ids:
+                self._pending.pop(key_id, None)
+
+    def decode(self, blob, row):
+        """Return the JSON text of the record packed in blob"""
+        blob = bytes(blob)
+        keys = self._keys.get(self.key_id(blob))
+        if keys is None:
+            raise KeyError(f"Unknown record key list {self.key_id(blob).hex()}")
+        body = blob[1 + _ID_SIZE:]
+        if blob[0] & _ZSTD:
+            body = self._decompressor().decompress(body)
+        record = {}
+        i = 0
+        for key in keys:
+            record[key], i = _unpack(body, i, row)
+        return json.dumps(record)
+
+    def decode_row(self, row):
+        """Replace a row's record blob with the data text readers expect"""
+        blob = row.pop('record', None)
+        if blob:
+            row['data'] = self.decode(blob, row)
+        return row
@@ -0,0 +1,161 @@
+"""Reject sink for records the ingest pipeline could not store.
+
+Rejected records are appended as JSON lines holding the raw record, its
+source file, offset (the line number where the reader knows it, otherwise
+the record's number within its source, counting from 1), the reason and
+the error, so nothing is silently lost. Writing happens on a
+background thread and the ingest loop only pays for a queue put. Paths
+ending in .gz or .zst are compressed.
+
+Instead of printing every bad record, the sink logs aggregated counts at
+most once per `interval` seconds and whenever it is flushed.
+"""
+import atexit
+import gzip
+import json
+import queue
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+WRITE_BATCH = 1000
+_STOP = object()
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'ab')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstandard is required to write .zst reject files (pip install zstandard)")
+        # Appending starts a new frame, which zstd readers treat as one stream
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'ab'), closefd=True)
+    return open(path, 'ab')
+
+
+class RejectSink:
+    """Buffered background writer for rejected records"""
+
+    def __init__(self, path, log=None, interval=10.0, max_pending=100000):
+        self.path = path
+        self.log = log
+        self.interval = interval
+        self.counts = Counter()
+        self._reported = 0
+        self._last_summary = time.monotonic()
+        # Bounded so a slow disk applies backpressure instead of growing memory
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+
+    def reject(self, record, source, reason, offset=None, error=None):
+        """Queue one rejected record"""
+        self._put(([record], source, offset, reason, error))
+
+    def reject_many(self, records, source, reason, error=None):
+        """Queue a group of records rejected together, e.g. a failed batch"""
+        if records:
+            self._put((list(records), source, None, reason, error))
+
+    def _put(self, item):
+        metrics.REJECTS.labels(item[3]).inc(len(item[0]))
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True, name='reject-writer')
+                    self._thread.start()
+                    # Finish the compressed stream even if the caller never closes us
+                    atexit.register(self.close)
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                item = None
+            lines = []
+            while item is not None:
+                if item is _STOP:
+                    self._write(lines)
+                    self._summarize(force=True)
+                    if self._file:
+                        self._file.close()
+                        self._file = None
+                    return
+                if isinstance(item, threading.Event):
+                    self._write(lines)
+                    lines = []
+                    self._summarize(force=True)
+                    item.set()
+                else:
+                    lines.extend(self._encode(item))
+                    if len(lines) >= WRITE_BATCH:
+                        self._write(lines)
+                        lines = []
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            self._write(lines)
+            self._summarize()
+
+    def _encode(self, item):
+        records, source, offset, reason, error = item
+        now = time.time()
+        self.counts[reason] += len(records)
+        for record in records:
+            entry = {
+                'time': now,
+                'source': source,
+                'offset': offset,
+                'reason': reason,
+                'error': error,
+                'record': record,
+            }
+            # default=str keeps pandas timestamps and other odd values
+            yield json.dumps(entry, ensure_ascii=False, default=str)
+
+    def _write(self, lines):
+        if not lines:
+            return
+        try:
+            if self._file is None:
+                self._file = _open(self.path)
+            self._file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self._file.flush()
+        except Exception as e:
+            if self.log:
+                self.log(f"[red]Error writing rejects to {self.path}: {e}[/red]")
+
+    def _summarize(self, force=False):
+        total = sum(self.counts.values())
+        now = time.monotonic()
+        if total == self._reported or not self.log:
+            return
+        if not force and now - self._last_summary < self.interval:
+            return
+        reasons = ', '.join(f"{reason.replace('_', ' ')}: {count:,}" for reason, count in self.counts.most_common())
+        self.log(f"[yellow]Rejected {total:,} records so far ({reasons}), saved to {self.path}[/yellow]")
+        self._reported = total
+        self._last_summary = now
+
+    def flush(self, timeout=None):
+        """Wait until queued rejects are written and log a summary"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
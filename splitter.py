@@ -0,0 +1,317 @@
+import codecs
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+SCAN_BLOCK = 4 * 1024 * 1024
+COPY_BLOCK = 16 * 1024 * 1024
+READ_BLOCK = 1024 * 1024
+SAMPLE_ENCODINGS = ['utf-8', 'cp1252', 'latin1']
+SNIFF_BYTES = 64 * 1024
+# How far past a target offset to look for a newline outside quotes before
+# giving up on the quote state (a stray quote would otherwise run to EOF)
+MAX_RECORD_SCAN = 16 * 1024 * 1024
+
+
+def is_wide_encoding(encoding):
+    """UTF-16/32 newlines span several bytes, so these can't be split at byte offsets"""
+    return codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32'))
+
+
+def iter_lines(f, encoding='utf-8', block_size=READ_BLOCK):
+    """Yield the lines of binary stream f as text, line endings included.
+
+    Lines come out as from a file opened with newline='', which is what
+    csv expects. Block reads are timed as the 'read' stage and decoding as
+    'decode', so a reader's I/O shows up apart from its parsing.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    rest = ''
+    while True:
+        with metrics.stage('read'):
+            raw = f.read(block_size)
+        with metrics.stage('decode'):
+            text = rest + decoder.decode(raw or b'', final=not raw)
+        if not raw:
+            break
+        # Only cut after a \n, so a \r\n pair is never split between blocks
+        end = text.rfind('\n') + 1
+        rest = text[end:]
+        if end:
+            yield from io.StringIO(text[:end], newline='')
+    if text:
+        yield from io.StringIO(text, newline='')
+
+
+def sniff_sample(raw):
+    """Guess the encoding and CSV dialect of a raw byte sample (e.g. the first SNIFF_BYTES)"""
+    if raw.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    elif raw.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        encoding = 'utf-32'
+    elif raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    else:
+        encoding = SAMPLE_ENCODINGS[-1]
+        # The sample may end mid-character, so ignore a short tail
+        sample = raw[:-4] if len(raw) > 4 else raw
+        for enc in SAMPLE_ENCODINGS:
+            try:
+                sample.decode(enc)
+            except UnicodeDecodeError:
+                continue
+            encoding = enc
+            break
+
+    text = raw.decode(encoding, errors='replace')
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=',;\t|:')
+    except csv.Error:
+        dialect = csv.excel
+    return encoding, dialect
+
+
+def read_header(file_path):
+    """Return the raw header line and the offset where the data starts"""
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        return header, f.tell()
+
+
+def _next_line_start(f, offset, file_size):
+    """Offset of the first line start at or after offset"""
+    f.seek(offset - 1)
+    f.readline()
+    return min(f.tell(), file_size)
+
+
+def _next_record_start(f, offset, file_size, in_quotes, quotechar=b'"'):
+    """Like _next_line_start but skips newlines inside quoted CSV fields.
+
+    in_quotes is the quote state at offset; returns the boundary and the
+    number of quote characters between offset and it, or None for the
+    count when no such newline turned up within MAX_RECORD_SCAN bytes.
+    """
+    pos = offset
+    quotes = 0
+    f.seek(offset)
+    limit = min(file_size, offset + MAX_RECORD_SCAN)
+    while pos < limit:
+        block = f.read(min(SCAN_BLOCK, limit - pos))
+        if not block:
+            break
+        start = 0
+        while True:
+            nl = block.find(b'\n', start)
+            if nl == -1:
+                quotes += block.count(quotechar, start)
+                break
+            quotes += block.count(quotechar, start, nl)
+            if (in_quotes + quotes) % 2 == 0:
+                return pos + nl + 1, quotes
+            start = nl + 1
+        pos += len(block)
+    if pos >= file_size:
+        return file_size, quotes
+    return _next_line_start(f, offset, file_size), None
+
+
+def split_ranges(file_path, parts, quote_aware=None, skip_header=True, quotechar='"', log=None):
+    """Split a file into up to `parts` line-aligned (start, end) byte ranges.
+
+    Boundaries start at evenly spaced offsets and move forward to the next
+    line start. With quote_aware (the default for .csv) the quote parity is
+    tracked with a fast counting pass so a newline inside a quoted field is
+    never used as a boundary. If the parity looks wrong (no newline outside
+    quotes within MAX_RECORD_SCAN bytes, usually a stray quote), the plain
+    next line start is used, the count restarts there and log is called
+    with a message.
+    """
+    if quote_aware is None:
+        quote_aware = file_path.endswith('.csv')
+    file_size = os.path.getsize(file_path)
+    data_start = read_header(file_path)[1] if skip_header else 0
+    if data_start >= file_size:
+        return []
+    parts = max(1, parts)
+    step = (file_size - data_start) // parts or 1
+    boundaries = [data_start]
+    with open(file_path, 'rb') as f:
+        scan_pos = data_start
+        quotes = 0
+        quote = quotechar.encode('ascii')
+        for i in range(1, parts):
+            target = data_start + i * step
+            if target <= boundaries[-1]:
+                continue
+            if target >= file_size:
+                break
+            if quote_aware:
+                # Bring the quote count up to the target, then find the first
+                # newline after it that is outside quotes.
+                f.seek(scan_pos)
+                remaining = target - scan_pos
+                while remaining > 0:
+                    block = f.read(min(SCAN_BLOCK, remaining))
+                    if not block:
+                        break
+                    quotes += block.count(quote)
+                    remaining -= len(block)
+                boundary, extra = _next_record_start(f, target, file_size, quotes % 2, quote)
+                if extra is None:
+                    if log:
+                        log(f"No record boundary within {MAX_RECORD_SCAN} bytes of offset {target} in {file_path}; "
+                            f"splitting at the next line instead (unbalanced quotes?)")
+                    quotes = 0
+                else:
+                    quotes += extra
+            else:
+                boundary = _next_line_start(f, target, file_size)
+            scan_pos = boundary
+            if boundary >= file_size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def line_numbers(file_path, offsets):
+    """Return the line number (1 is the first line) at each of the sorted byte offsets"""
+    numbers = []
+    line = 1
+    pos = 0
+    with open(file_path, 'rb') as f:
+        for offset in offsets:
+            while pos < offset:
+                block = f.read(min(SCAN_BLOCK, offset - pos))
+                if not block:
+                    break
+                line += block.count(b'\n')
+                pos += len(block)
+            numbers.append(line)
+    return numbers
+
+
+def _copy_range(src, dst, start, end):
+    """Copy [start, end) of src to dst, zero-copy where the OS supports it"""
+    length = end - start
+    if hasattr(os, 'copy_file_range'):
+        try:
+            offset = start
+            while length > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), min(length, 1 << 30), offset)
+                if copied == 0:
+                    break
+                offset += copied
+                length -= copied
+            if length == 0:
+                return
+            start = offset
+        except OSError:
+            pass
+    src.seek(start)
+    dst.seek(0, os.SEEK_END)
+    while length > 0:
+        block = src.read(min(COPY_BLOCK, length))
+        if not block:
+            break
+        dst.write(block)
+        length -= len(block)
+
+
+def _write_part(file_path, part_path, header, start, end):
+    with open(file_path, 'rb') as src, open(part_path, 'wb') as dst:
+        if header:
+            dst.write(header if header.endswith(b'\n') else header + b'\n')
+            dst.flush()
+        _copy_range(src, dst, start, end)
+    return part_path
+
+
+def split_file(file_path, parts, workers=None, header=None, quote_aware=None, log=None):
+    """Split a file into line-aligned parts written in parallel.
+
+    The header line is repeated at the top of every part for .csv files
+    (or when header=True). Returns the list of part paths.
+    """
+    if header is None:
+        header = file_path.endswith('.csv')
+    base_name, ext = os.path.splitext(file_path)
+    header_line = read_header(file_path)[0] if header else b''
+    ranges = split_ranges(file_path, parts, quote_aware, skip_header=header, log=log)
+    with ThreadPoolExecutor(max_workers=workers or min(len(ranges), os.cpu_count() or 1) or 1) as executor:
+        futures = [
+            executor.submit(_write_part, file_path, f"{base_name}_part{i+1}{ext}", header_line, start, end)
+            for i, (start, end) in enumerate(ranges)
+        ]
+        return [future.result() for future in futures]
+
+
+def estimate_parts(file_path, rows_per_part, sample_bytes=1024 * 1024):
+    """Estimate how many parts give roughly rows_per_part rows each"""
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        f.readline()
+        sample = f.read(sample_bytes)
+    lines = sample.count(b'\n') or 1
+    estimated_rows = file_size / (len(sample) / lines) if sample else 0
+    return max(1, -(-int(estimated_rows) // max(1, rows_per_part)))
+
+
+def iter_range_chunks(file_path, start, end, fieldnames, chunk_size=10000, encoding='utf-8', progress=None,
+                      dialect='excel', first_line=1):
+    """Yield (records, line numbers) chunks parsed from the byte range [start, end) of a CSV.
+
+    This is the "virtual" split: ingest workers each take a range from
+    split_ranges and parse it directly, so no part files are written.
+    first_line is the line number at start (see line_numbers); each record
+    gets the number of the line it ends on, which is its only line unless
+    a quoted field spans lines.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        lines = iter_lines(_RangeReader(f, end - start, progress), encoding)
+        reader = csv.DictReader(lines, fieldnames=fieldnames, dialect=dialect)
+        records = []
+        lines = []
+        for record in reader:
+            # Surplus fields land under the None key; keep them addressable
+            if None in record:
+                extra = record.pop(None)
+                for i, value in enumerate(extra):
+                    record[f'column{len(fieldnames) + i + 1}'] = value
+            records.append(record)
+            lines.append(first_line + reader.line_num - 1)
+            if len(records) >= chunk_size:
+                yield records, lines
+                records = []
+                lines = []
+        if records:
+            yield records, lines
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw stream exposing only the next `length` bytes of a file"""
+
+    def __init__(self, f, length, progress=None):
+        self.f = f
+        self.remaining = length
+        self.progress = progress
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        data = self.f.read(min(len(buffer), self.remaining))
+        n = len(data)
+        buffer[:n] = data
+        self.remaining -= n
+        if self.progress and n:
+            self.progress(n)
+        return n
@@ -0,0 +1,290 @@
+import codecs
+import re
+
+import metrics
+
+# One regex pass splits a buffer into SQL tokens. Quoted strings, quoted
+# identifiers and comments may run into the end of the buffer (\Z), in which
+# case the parser waits for the next block before consuming them.
+_TOKEN = re.compile(r"""
+      '(?:[^'\\]|\\[\s\S]|'')*(?:'|\\?\Z)
+    | "(?:[^"\\]|\\[\s\S]|"")*(?:"|\\?\Z)
+    | `[^`]*(?:`|\Z)
+    | /\*[\s\S]*?(?:\*/|\Z)
+    | (?:--|\#)[^\n]*(?:\n|\Z)
+    | [(),;]
+    | \s+
+    | [^\s'"`(),;]+
+""", re.VERBOSE)
+
+_MYSQL_ESCAPES = {
+    '0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a',
+}
+_ESCAPE = re.compile(r"\\(.)|''|\"\"", re.S)
+_COPY_ESCAPE = re.compile(r"\\(.)", re.S)
+_CONSTRAINT_WORDS = {
+    'PRIMARY', 'KEY', 'UNIQUE', 'INDEX', 'CONSTRAINT', 'FOREIGN',
+    'FULLTEXT', 'SPATIAL', 'CHECK', 'EXCLUDE', 'LIKE',
+}
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def _unescape(match):
+    if match.group(1) is None:
+        return match.group(0)[0]
+    return _MYSQL_ESCAPES.get(match.group(1), match.group(1))
+
+
+def _identifier(token):
+    """Strip quoting from an identifier"""
+    return token.strip('`"')
+
+
+def _table_name(tokens, i):
+    """Return the unqualified table name at tokens[i] and the index after it"""
+    name = tokens[i]
+    i += 1
+    # Join schema qualified names that the tokenizer split, e.g. `db`.`users`
+    while i < len(tokens) and (name.endswith('.') or tokens[i].startswith('.')):
+        name += tokens[i]
+        i += 1
+    return _identifier(name.rsplit('.', 1)[-1]), i
+
+
+def _column_list(tokens, i):
+    """Return the identifiers of a parenthesised column list starting at tokens[i]"""
+    if tokens[i:i + 1] != ['(']:
+        return None
+    end = tokens.index(')', i)
+    return [_identifier(t) for t in tokens[i + 1:end] if t != ',']
+
+
+def _record(columns, fields):
+    if not columns:
+        columns = [f'column{i+1}' for i in range(len(fields))]
+    return dict(zip(columns, fields))
+
+
+def _value(tokens):
+    """Convert the tokens of one VALUES field to a Python value"""
+    strings = [t for t in tokens if t[0] in '\'"']
+    if strings:
+        # Covers plain literals as well as _binary'..' / N'..' prefixes
+        return _ESCAPE.sub(_unescape, strings[-1][1:-1])
+    text = ''.join(tokens).strip()
+    if text.upper() == 'NULL':
+        return None
+    return text
+
+
+def _copy_value(field):
+    if field == '\\N':
+        return None
+    return _COPY_ESCAPE.sub(_unescape, field)
+
+
+class SQLDumpParser:
+    """Streaming parser for MySQL/PostgreSQL text dumps.
+
+    Column names are taken from CREATE TABLE statements (or an explicit
+    INSERT column list) and every tuple of INSERT ... VALUES and every row of
+    a PostgreSQL COPY ... FROM stdin block is yielded as a (table, record)
+    pair. The file (or an already open binary fileobj) is read in fixed size
+    blocks so memory stays bounded no matter how large a single INSERT
+    statement is.
+    """
+
+    def __init__(self, file_path, encoding='utf-8', block_size=BLOCK_SIZE, progress=None, fileobj=None):
+        self.file_path = file_path
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.block_size = block_size
+        self.progress = progress
+        self.tables = {}
+        self.bytes_read = 0
+
+    def _blocks(self):
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        f = self.fileobj or open(self.file_path, 'rb')
+        try:
+            while True:
+                with metrics.stage('read'):
+                    raw = f.read(self.block_size)
+                self.bytes_read += len(raw)
+                if self.progress and raw:
+                    self.progress(len(raw))
+                with metrics.stage('decode'):
+                    text = decoder.decode(raw, final=not raw)
+                if text:
+                    yield text
+                if not raw:
+                    return
+        finally:
+            if self.fileobj is None:
+                f.close()
+
+    def __iter__(self):
+        blocks = self._blocks()
+        buf = ''
+        pos = 0
+        eof = False
+        statement = []      # tokens of the current non-INSERT statement
+        insert = None       # state of the current INSERT statement
+        copy = None         # (table, columns) while inside a COPY block
+
+        while True:
+            if copy is not None:
+                end = buf.find('\n', pos)
+                if end == -1:
+                    if not eof:
+                        block = next(blocks, '')
+                        buf = buf[pos:] + block
+                        pos = 0
+                        eof = not block
+                        continue
+                    if pos >= len(buf):
+                        break
+                    end = len(buf)
+                line = buf[pos:end].rstrip('\r')
+                pos = end + 1
+                if line == '\\.':
+                    copy = None
+                elif line:
+                    table, columns = copy
+                    yield table, _record(columns, [_copy_value(f) for f in line.split('\t')])
+                continue
+
+            match = _TOKEN.match(buf, pos) if pos < len(buf) else None
+            if match is None or (match.end() == len(buf) and not eof):
+                if eof:
+                    break
+                block = next(blocks, '')
+                buf = buf[pos:] + block
+                pos = 0
+                eof = not block
+                continue
+
+            token = match.group(0)
+            pos = match.end()
+            if token.isspace() or token[:2] in ('--', '/*') or token[0] == '#':
+                continue
+
+            if insert is not None:
+                row = self._feed_insert(insert, token)
+                if row is not None:
+                    yield row
+                if token == ';' and insert['depth'] == 0:
+                    insert = None
+                continue
+
+            if token == ';':
+                copy = self._finish_statement(statement)
+                statement = []
+                continue
+
+            statement.append(token)
+            if statement[0].upper() in ('INSERT', 'REPLACE') and token.upper() == 'VALUES':
+                insert = self._start_insert(statement)
+                statement = []
+
+    def _finish_statement(self, tokens):
+        """Record CREATE TABLE columns; return COPY state for COPY ... FROM stdin"""
+        if not tokens:
+            return None
+        words = [t.upper() for t in tokens]
+        if words[0] == 'CREATE' and 'TABLE' in words:
+            self._create_table(tokens, words)
+        elif words[0] == 'COPY' and 'STDIN' in words:
+            table, i = _table_name(tokens, 1)
+            return table, _column_list(tokens, i) or self.tables.get(table)
+        return None
+
+    def _create_table(self, tokens, words):
+        i = words.index('TABLE') + 1
+        if words[i:i + 3] == ['IF', 'NOT', 'EXISTS']:
+            i += 3
+        table, i = _table_name(tokens, i)
+        try:
+            start = tokens.index('(', i)
+        except ValueError:
+            return
+        columns = []
+        depth = 0
+        expect_name = True
+        for token in tokens[start + 1:]:
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                if depth == 0:
+                    break
+                depth -= 1
+            elif token == ',' and depth == 0:
+                expect_name = True
+            elif expect_name:
+                expect_name = False
+                if token.upper() not in _CONSTRAINT_WORDS:
+                    columns.append(_identifier(token))
+        self.tables[table] = columns
+
+    def _start_insert(self, tokens):
+        words = [t.upper() for t in tokens]
+        i = words.index('INTO') + 1 if 'INTO' in words else 1
+        table, i = _table_name(tokens, i)
+        columns = _column_list(tokens, i)
+        return {
+            'table': table,
+            'columns': columns or self.tables.get(table),
+            'depth': 0,
+            'field': [],
+            'fields': [],
+            'done': False,
+        }
+
+    def _feed_insert(self, state, token):
+        """Advance the VALUES tuple state machine; return a finished row"""
+        if state['done']:
+            # Trailing clauses such as ON DUPLICATE KEY UPDATE are skipped
+            return None
+        depth = state['depth']
+        if token == '(':
+            state['depth'] = depth + 1
+            if depth == 0:
+                state['field'] = []
+                state['fields'] = []
+                return None
+        elif token == ')':
+            state['depth'] = depth - 1
+            if depth == 1:
+                state['fields'].append(_value(state['field']))
+                return state['table'], _record(state['columns'], state['fields'])
+        elif token == ',' and depth == 1:
+            state['fields'].append(_value(state['field']))
+            state['field'] = []
+            return None
+        elif depth == 0:
+            if token not in (',', ';'):
+                state['done'] = True
+            return None
+        state['field'].append(token)
+        return None
+
+
+def iter_dump_records(file_path, encoding='utf-8', progress=None):
+    """Yield (table, record) pairs from a SQL dump file"""
+    return iter(SQLDumpParser(file_path, encoding=encoding, progress=progress))
+
+
+def iter_dump_chunks(file_path, chunk_size=10000, encoding='utf-8', progress=None):
+    """Yield (table, records) chunks of at most chunk_size rows from a SQL dump"""
+    current_table = None
+    records = []
+    for table, record in iter_dump_records(file_path, encoding, progress):
+        if table != current_table or len(records) >= chunk_size:
+            if records:
+                yield current_table, records
+            current_table = table
+            records = []
+        records.append(record)
+    if records:
+        yield current_table, records
@@ -0,0 +1,227 @@
+"""Storage backends for the ingest and search pipelines.
+
+StorageBackend is the interface the pipelines in main.py talk to.
+main.ScyllaApp implements it for ScyllaDB; SQLiteBackend keeps the same
+user_data table in a single local file, for laptops, CI and small
+investigations that don't warrant a running cluster.
+
+The *_async methods are what coroutines await. By default they run the
+blocking method in a thread; ScyllaApp overrides them with the driver's
+own async requests.
+"""
+import asyncio
+import re
+import sqlite3
+import threading
+
+from recordcodec import RecordCodec
+
+COLUMNS = ['email', 'username', 'first_name', 'last_name', 'phone_number', 'city', 'state', 'dob', 'source', 'data', 'password']
+INDEXED_COLUMNS = ['username', 'first_name', 'last_name', 'phone_number']
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def check_identifier(name):
+    """Return name if it is safe to splice into a query as a column name"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return name
+
+
+class StorageBackend:
+    """Operations the ingest and search pipelines need from a store.
+
+    Rows are dicts of column name -> text value keyed by email. Writes are
+    upserts: only the columns present in a row change on an existing one.
+    Written rows carry the full record as a `record` blob from the
+    backend's codec; rows read back have it decoded into `data` again.
+    """
+
+    codec = None
+
+    def columns(self):
+        """Return the set of user_data column names"""
+        raise NotImplementedError
+
+    def add_column(self, name):
+        """Add a text column to user_data"""
+        raise NotImplementedError
+
+    def insert_batch(self, rows):
+        """Write rows as one batch"""
+        raise NotImplementedError
+
+    def get(self, email):
+        """Point lookup by primary key; returns a list of zero or one rows"""
+        raise NotImplementedError
+
+    def lookup(self, field, value, limit=None):
+        """Return rows whose field equals value"""
+        raise NotImplementedError
+
+    def scan(self, limit=None):
+        """Yield every row"""
+        raise NotImplementedError
+
+    def count(self):
+        """Return the number of rows"""
+        raise NotImplementedError
+
+    def hosts(self):
+        """Return the live hosts writes are spread over"""
+        return ['local']
+
+    async def add_column_async(self, name):
+        await asyncio.to_thread(self.add_column, name)
+
+    async def insert_batch_async(self, rows):
+        await asyncio.to_thread(self.insert_batch, rows)
+
+    async def lookup_async(self, field, value, limit=None):
+        return await asyncio.to_thread(self.lookup, field, value, limit)
+
+    async def count_async(self):
+        return await asyncio.to_thread(self.count)
+
+    def close(self):
+        pass
+
+
+def _dict_row(cursor, row):
+    return {description[0]: value for description, value in zip(cursor.description, row)}
+
+
+class SQLiteBackend(StorageBackend):
+    """user_data in an embedded SQLite database.
+
+    The table is keyed by email WITHOUT ROWID, so the indexes on the
+    searchable columns carry the email and cover key lookups and counts.
+    WAL mode lets searches read while a single connection writes; each
+    batch is one transaction.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path='user_data.db', codec=None):
+        self.path = path
+        self.codec = codec or RecordCodec()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._upserts = {}
+        self._writer = self._connect()
+        self._migrate()
+        self._columns = self._table_columns()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = _dict_row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL only fsyncs at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        self._connections.append(conn)
+        return conn
+
+    def _reader(self):
+        # One read connection per thread; WAL readers don't block the writer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                conn = self._local.conn = self._connect()
+        return conn
+
+    def _migrate(self):
+        conn = self._writer
+        version = conn.execute("PRAGMA user_version").fetchone()['user_version']
+        if version >= self.SCHEMA_VERSION:
+            return
+        if version < 1:
+            columns = ', '.join(f"{column} TEXT" + (" PRIMARY KEY" if column == 'email' else '') for column in COLUMNS)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS user_data ({columns}) WITHOUT ROWID")
+            for column in INDEXED_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} ON user_data ({column})")
+        if version < 2:
+            # Packed records and the key lists they refer to
+            if 'record' not in self._table_columns():
+                conn.execute("ALTER TABLE user_data ADD COLUMN record BLOB")
+            conn.execute("CREATE TABLE IF NOT EXISTS record_keys (id BLOB PRIMARY KEY, source TEXT, keys TEXT) WITHOUT ROWID")
+        conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _table_columns(self):
+        return {row['name'] for row in self._writer.execute("PRAGMA table_info(user_data)")}
+
+    def columns(self):
+        return set(self._columns)
+
+    def add_column(self, name):
+        check_identifier(name)
+        with self._lock:
+            if name in self._columns:
+                raise ValueError(f"Invalid column name {name} because it conflicts with an existing column")
+            self._writer.execute(f'ALTER TABLE user_data ADD COLUMN "{name}" TEXT')
+            self._columns = self._table_columns()
+
+    def _upsert(self, columns):
+        query = self._upserts.get(columns)
+        if query is None:
+            names = ', '.join(f'"{check_identifier(c)}"' for c in columns)
+            placeholders = ', '.join('?' * len(columns))
+            updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c != 'email')
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            query = self._upserts[columns] = f"INSERT INTO user_data ({names}) VALUES ({placeholders}) ON CONFLICT(email) {action}"
+        return query
+
+    def insert_batch(self, rows):
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(tuple(row.values()))
+        with self._lock:
+            conn = self._writer
+            # Key lists go in the same transaction as the first rows using them
+            keys = self.codec.pending() if groups else []
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO record_keys (id, source, keys) VALUES (?, ?, ?)", keys)
+                for columns, values in groups.items():
+                    conn.executemany(self._upsert(columns), values)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.codec.saved(key_id for key_id, _, _ in keys)
+
+    def _decode(self, rows):
+        conn = self._reader()
+        for key_id in self.codec.missing(rows):
+            for row in conn.execute("SELECT keys FROM record_keys WHERE id = ?", (key_id,)):
+                self.codec.learn(key_id, row['keys'])
+        return [self.codec.decode_row(row) for row in rows]
+
+    def get(self, email):
+        return self._decode(self._reader().execute("SELECT * FROM user_data WHERE email = ?", (email,)).fetchall())
+
+    def lookup(self, field, value, limit=None):
+        if field == 'email':
+            return self.get(value)
+        query = f'SELECT * FROM user_data WHERE "{check_identifier(field)}" = ?'
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return self._decode(self._reader().execute(query, (value,)).fetchall())
+
+    def scan(self, limit=None):
+        query = "SELECT * FROM user_data"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        for row in self._reader().execute(query):
+            yield from self._decode([row])
+
+    def count(self):
+        return self._reader().execute("SELECT COUNT(*) AS n FROM user_data").fetchone()['n']
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
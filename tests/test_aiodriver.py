@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+from aiodriver import execute, iter_pages
+
+
+class PagingFuture:
+    """ResponseFuture that serves pages from a driver-like thread on demand"""
+
+    def __init__(self, pages, error=None):
+        self._pages = list(pages)
+        self._error = error
+        self.fetches = 0
+        self.has_more_pages = True
+
+    def add_callbacks(self, callback, errback):
+        self._callback = callback
+        self._errback = errback
+        self._complete()
+        return self
+
+    def start_fetching_next_page(self):
+        self.fetches += 1
+        self._complete()
+
+    def _complete(self):
+        if self._pages:
+            rows = self._pages.pop(0)
+            self.has_more_pages = bool(self._pages) or self._error is not None
+            threading.Thread(target=self._callback, args=(rows,)).start()
+        else:
+            self.has_more_pages = False
+            threading.Thread(target=self._errback, args=(self._error,)).start()
+
+
+class PagingSession:
+    def __init__(self, future):
+        self.future = future
+        self.queries = []
+
+    def execute_async(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        return self.future
+
+
+def test_iter_pages_fetches_the_next_page_on_demand():
+    future = PagingFuture([[1, 2], None, [3]])
+    session = PagingSession(future)
+
+    async def consume():
+        pages = []
+        async for page in iter_pages(session, 'SELECT * FROM t WHERE k = %s', ('a',)):
+            # Nothing is requested ahead of the consumer
+            assert future.fetches == len(pages)
+            pages.append(page)
+        return pages
+
+    assert asyncio.run(consume()) == [[1, 2], [], [3]]
+    assert future.fetches == 2
+    assert session.queries == [('SELECT * FROM t WHERE k = %s', ('a',))]
+
+
+def test_execute_collects_every_page():
+    session = PagingSession(PagingFuture([[1], [2, 3], [4]]))
+    assert asyncio.run(execute(session, 'SELECT * FROM t')) == [1, 2, 3, 4]
+
+
+def test_errback_raises_after_the_pages_already_served():
+    session = PagingSession(PagingFuture([[1, 2]], error=TimeoutError('read timeout')))
+
+    async def consume():
+        pages = []
+        with pytest.raises(TimeoutError, match='read timeout'):
+            async for page in iter_pages(session, 'SELECT * FROM t'):
+                pages.append(page)
+        return pages
+
+    assert asyncio.run(consume()) == [[1, 2]]
+
+
+def test_execute_raises_the_first_page_error():
+    session = PagingSession(PagingFuture([], error=ConnectionError('no hosts')))
+    with pytest.raises(ConnectionError, match='no hosts'):
+        asyncio.run(execute(session, 'SELECT * FROM t'))
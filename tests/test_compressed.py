@@ -0,0 +1,95 @@
+import bz2
+import gzip
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from compressed import iter_compressed_chunks
+
+CSV = b'email,name\n' + b''.join(b'u%d@example.com,user %d\n' % (i, i) for i in range(2000))
+
+
+def read(path):
+    errors = []
+    records = [
+        record
+        for _, chunk in iter_compressed_chunks(str(path), chunk_size=500, on_error=lambda name, e: errors.append(name))
+        for record in chunk
+    ]
+    return records, errors
+
+
+def tar_bytes(members, mode='w:gz'):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize('suffix, compress', [('.csv.gz', gzip.compress), ('.csv.bz2', bz2.compress)])
+def test_compressed_csv(tmp_path, suffix, compress):
+    path = tmp_path / f'leak{suffix}'
+    path.write_bytes(compress(CSV))
+    records, errors = read(path)
+    assert len(records) == 2000 and not errors
+    assert records[0] == {'email': 'u0@example.com', 'name': 'user 0'}
+
+
+@pytest.mark.parametrize('suffix, compress', [('.csv.gz', gzip.compress), ('.csv.bz2', bz2.compress)])
+def test_truncated_stream_is_reported(tmp_path, suffix, compress):
+    data = compress(CSV)
+    path = tmp_path / f'leak{suffix}'
+    path.write_bytes(data[:len(data) // 2])
+    records, errors = read(path)
+    assert errors
+    assert len(records) < 2000
+
+
+def test_truncated_tar_is_reported(tmp_path):
+    data = tar_bytes([('one.csv', CSV), ('two.csv', CSV)])
+    path = tmp_path / 'leak.tgz'
+    path.write_bytes(data[:len(data) * 2 // 3])
+    _, errors = read(path)
+    assert errors
+
+
+def test_corrupt_zip_member_is_skipped(tmp_path):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('one.csv', CSV)
+        zf.writestr('two.csv', CSV)
+    data = bytearray(buf.getvalue())
+    # Damage the deflate stream of the first member only
+    start = data.index(b'one.csv') + len(b'one.csv') + 100
+    data[start:start + 64] = b'\0' * 64
+    path = tmp_path / 'leak.zip'
+    path.write_bytes(bytes(data))
+
+    records, errors = read(path)
+    assert errors == [f'{path}:one.csv']
+    assert len(records) >= 2000
+    assert records[-1] == {'email': 'u1999@example.com', 'name': 'user 1999'}
+
+
+def test_unsupported_member_is_skipped(tmp_path):
+    path = tmp_path / 'leak.tgz'
+    path.write_bytes(tar_bytes([('notes.bin', b'\0\1\2'), ('two.csv', CSV)]))
+    records, errors = read(path)
+    assert errors == [f'{path}:notes.bin']
+    assert len(records) == 2000
+
+
+def test_json_lines_member_matches_plain_text_reader(tmp_path):
+    path = tmp_path / 'combo.txt.gz'
+    path.write_bytes(gzip.compress(b'{"email": "a@example.com"}\na@x.com:pw\n[1]\n\nnot json\n'))
+    rejects = []
+    chunks = list(iter_compressed_chunks(
+        str(path), on_reject=lambda name, line, line_number, error: rejects.append((name, line, line_number, bool(error)))
+    ))
+    assert chunks == [(f'{path}:combo.txt', [{'email': 'a@example.com'}, {'email': 'a@x.com', 'password': 'pw'}])]
+    assert rejects == [(f'{path}:combo.txt', '[1]', 3, True), (f'{path}:combo.txt', 'not json', 5, True)]
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import jsonl
+from jsonl import decode_block, iter_jsonl_chunks, parse_combo
+
+BLOCK = b'\n'.join([
+    b'{"email": "a@example.com"}',
+    b'',
+    b'b@example.com:hunter2',
+    b'[1, 2]',
+    b'  {"email": "c@example.com", "name": "Zo\xc3\xab"}  ',
+    b'{"email": "broken"',
+    b'd@example.com;pass:with:colons',
+])
+
+
+def test_decode_block_records_and_combo_fallback():
+    records, _, seconds = decode_block(BLOCK, 10)
+    assert records == [
+        {'email': 'a@example.com'},
+        {'email': 'b@example.com', 'password': 'hunter2'},
+        {'email': 'c@example.com', 'name': 'Zoë'},
+        {'email': 'd@example.com', 'password': 'pass:with:colons'},
+    ]
+    assert seconds >= 0
+
+
+def test_decode_block_rejects_carry_line_numbers_and_errors():
+    _, rejects, _ = decode_block(BLOCK, 10)
+    assert [(line, text) for line, text, _ in rejects] == [(13, '[1, 2]'), (15, '{"email": "broken"')]
+    assert rejects[0][2] == 'JSON list, not an object'
+    assert rejects[1][2]
+
+
+def test_parse_combo():
+    assert parse_combo('a@example.com|secret') == {'email': 'a@example.com', 'password': 'secret'}
+    assert parse_combo('not a combo line') is None
+    assert parse_combo('user:secret') is None
+
+
+def write_lines(path, count):
+    lines = []
+    for i in range(count):
+        if i % 100 == 7:
+            lines.append('not json')
+        elif i % 100 == 9:
+            lines.append(f'u{i}@example.com:secret{i}')
+        else:
+            lines.append(json.dumps({'email': f'u{i}@example.com', 'n': i}))
+    path.write_text('\n'.join(lines) + '\n')
+    return lines
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_iter_jsonl_chunks_across_blocks(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(jsonl, 'READ_BLOCK', 1000)
+    path = tmp_path / 'leak.txt'
+    lines = write_lines(path, 1000)
+    rejects = []
+    chunks = list(iter_jsonl_chunks(
+        str(path), chunk_size=64, workers=workers,
+        on_reject=lambda name, line, line_number, error: rejects.append((line_number, line))
+    ))
+
+    records = [record for _, chunk in chunks for record in chunk]
+    assert all(len(chunk) == 64 for _, chunk in chunks[:-1])
+    assert len(records) == 990
+    assert records[8] == {'email': 'u9@example.com', 'password': 'secret9'}
+    assert records[-1] == {'email': 'u999@example.com', 'n': 999}
+    assert rejects == [(i + 1, lines[i]) for i in range(7, 1000, 100)]
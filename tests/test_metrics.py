@@ -0,0 +1,59 @@
+import threading
+
+import metrics
+
+
+def test_counter_values_are_exact():
+    counter = metrics.counter('test_bytes_total', 'Bytes')
+    counter.inc(123456789)
+    counter.inc(0.5)
+    assert counter.render() == [
+        '# HELP test_bytes_total Bytes',
+        '# TYPE test_bytes_total counter',
+        'test_bytes_total 123456789.5',
+    ]
+
+
+def test_labelled_gauge():
+    gauge = metrics.gauge('test_inflight', 'In flight', ['host'])
+    gauge.labels('a"b').set(3)
+    gauge.labels('c').set(float('inf'))
+    assert gauge.render()[2:] == ['test_inflight{host="a\\"b"} 3', 'test_inflight{host="c"} +Inf']
+
+
+def test_histogram_buckets_keep_their_bounds():
+    histogram = metrics.histogram('test_payload_bytes', 'Payload', buckets=(0.0025, 1024, 1048576, 16777216))
+    for value in (0.001, 10, 2000000, 2000000, 99999999):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'test_payload_bytes_bucket{le="0.0025"} 1',
+        'test_payload_bytes_bucket{le="1024"} 2',
+        'test_payload_bytes_bucket{le="1048576"} 2',
+        'test_payload_bytes_bucket{le="16777216"} 4',
+        'test_payload_bytes_bucket{le="+Inf"} 5',
+        'test_payload_bytes_sum 104000009.001',
+        'test_payload_bytes_count 5',
+    ]
+
+
+def test_render_includes_registered_metrics():
+    metrics.BYTES_READ.inc(123456789)
+    text = metrics.render()
+    assert text.endswith('\n')
+    assert '# TYPE scylla_batch_payload_bytes histogram' in text
+    assert 'scylla_batch_payload_bytes_bucket{le="1048576"}' in text
+    assert 'e+' not in text
+
+
+def test_stage_time_is_counted_per_thread():
+    before = metrics.thread_stage_seconds()
+    metrics.observe_stage('test', 0.25)
+    with metrics.stage('test'):
+        pass
+    assert metrics.thread_stage_seconds() - before >= 0.25
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(metrics.thread_stage_seconds()))
+    thread.start()
+    thread.join()
+    assert seen == [0.0]
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from recordcodec import RecordCodec
+
+RECORD = {
+    'email': 'alice@example.com',
+    'Password': 'hunter2',
+    'login': 'alice@example.com',
+    'age': 42,
+    'balance': -17,
+    'big': 2 ** 70,
+    'score': 3.25,
+    'active': True,
+    'banned': False,
+    'note': None,
+    'name': 'Zoë',
+    'tags': ['a', 'b'],
+    'meta': {'ip': '10.0.0.1'},
+    'empty': '',
+}
+
+
+def typed_row(record):
+    return {'email': record['email'], 'password': record['Password'], 'source': 'leak.json'}
+
+
+@pytest.mark.parametrize('level', [None, 3])
+def test_round_trip(level):
+    if level is not None:
+        pytest.importorskip('zstandard')
+    codec = RecordCodec(level)
+    row = typed_row(RECORD)
+    blob = codec.encode(RECORD, row)
+    assert codec.decode(blob, row) == json.dumps(RECORD)
+
+
+def test_values_equal_to_typed_columns_are_references():
+    codec = RecordCodec()
+    row = typed_row(RECORD)
+    unrelated = dict(RECORD, email='bob@example.org', login='bob@example.org', Password='other')
+    assert len(codec.encode(RECORD, row)) < len(codec.encode(unrelated, row))
+
+
+def test_large_bodies_are_compressed():
+    pytest.importorskip('zstandard')
+    codec = RecordCodec(3)
+    record = {'email': 'a@example.com', 'bio': 'lorem ipsum ' * 50}
+    blob = codec.encode(record, {'email': 'a@example.com'})
+    assert blob[0] & 1
+    assert len(blob) < len(record['bio'])
+    assert codec.decode(blob, {'email': 'a@example.com'}) == json.dumps(record)
+
+
+def test_key_lists_are_shared_per_source():
+    codec = RecordCodec()
+    first = codec.encode({'email': 'a@example.com', 'x': '1'}, {'source': 's'})
+    second = codec.encode({'email': 'b@example.com', 'x': '2'}, {'source': 's'})
+    other = codec.encode({'email': 'c@example.com', 'x': '3'}, {'source': 't'})
+    assert codec.key_id(first) == codec.key_id(second) != codec.key_id(other)
+    assert len(codec.pending()) == 2
+
+
+def test_unknown_key_list():
+    writer = RecordCodec()
+    row = typed_row(RECORD)
+    blob = writer.encode(RECORD, row)
+
+    reader = RecordCodec()
+    assert reader.missing([{'record': blob}, {'record': None}]) == {reader.key_id(blob)}
+    with pytest.raises(KeyError):
+        reader.decode(blob, row)
+
+    # What a backend loads from record_keys
+    [(key_id, source, keys)] = writer.pending()
+    assert source == 'leak.json'
+    reader.learn(key_id, keys)
+    assert reader.missing([{'record': blob}]) == set()
+    assert json.loads(reader.decode_row(dict(row, record=blob))['data']) == RECORD
+
+
+def test_saved_key_lists_are_no_longer_pending():
+    codec = RecordCodec()
+    codec.encode({'email': 'a@example.com'}, {'source': 's'})
+    [(key_id, _, _)] = codec.pending()
+    codec.saved([key_id])
+    assert codec.pending() == []
+    codec.encode({'email': 'b@example.com'}, {'source': 's'})
+    assert codec.pending() == []
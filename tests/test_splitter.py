@@ -0,0 +1,80 @@
+import csv
+
+import splitter
+from splitter import iter_range_chunks, line_numbers, sniff_sample, split_ranges
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['email', 'note'])
+        writer.writerows(rows)
+    return str(path)
+
+
+def read_ranges(path, ranges):
+    fieldnames = ['email', 'note']
+    records = []
+    lines = []
+    for (start, end), first_line in zip(ranges, line_numbers(path, [start for start, _ in ranges])):
+        for chunk, chunk_lines in iter_range_chunks(path, start, end, fieldnames, chunk_size=7, first_line=first_line):
+            records.extend(chunk)
+            lines.extend(chunk_lines)
+    return records, lines
+
+
+def test_ranges_cover_the_data_and_skip_quoted_newlines(tmp_path):
+    rows = [[f'u{i}@example.com', f'first\nsecond, "{i}"\n'] for i in range(500)]
+    path = write_csv(tmp_path / 'leak.csv', rows)
+    ranges = split_ranges(path, 8)
+
+    assert len(ranges) > 1
+    assert ranges[0][0] == len('email,note\r\n')
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    records, _ = read_ranges(path, ranges)
+    assert [[r['email'], r['note']] for r in records] == rows
+
+
+def test_line_numbers_of_range_records(tmp_path):
+    rows = [[f'u{i}@example.com', 'a\nb' if i % 2 else 'plain'] for i in range(100)]
+    path = write_csv(tmp_path / 'leak.csv', rows)
+    _, lines = read_ranges(path, split_ranges(path, 5))
+
+    expected = []
+    line = 1
+    for _, note in rows:
+        line += note.count('\n') + 1
+        expected.append(line)
+    assert lines == expected
+
+
+def test_stray_quote_falls_back_to_line_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(splitter, 'MAX_RECORD_SCAN', 1024)
+    path = tmp_path / 'broken.csv'
+    with open(path, 'w', newline='') as f:
+        f.write('email,note\n1@example.com,"unterminated\n')
+        for i in range(5000):
+            f.write(f'u{i}@example.com,x\n')
+    messages = []
+    ranges = split_ranges(str(path), 4, log=messages.append)
+
+    assert len(ranges) == 4
+    assert len(messages) == 1
+    assert ranges[-1][1] == path.stat().st_size
+
+
+def test_plain_text_split_at_line_starts(tmp_path):
+    path = tmp_path / 'combo.txt'
+    path.write_bytes(b''.join(b'u%d@example.com:secret\n' % i for i in range(1000)))
+    ranges = split_ranges(str(path), 6, skip_header=False)
+
+    data = path.read_bytes()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(data[start - 1:start] == b'\n' for start, _ in ranges[1:])
+
+
+def test_sniff_sample():
+    encoding, dialect = sniff_sample('email;name\na@example.com;José\nb@example.com;Ana\n'.encode('cp1252'))
+    assert (encoding, dialect.delimiter) == ('cp1252', ';')
+    assert sniff_sample('a,b\n1,2\n'.encode('utf-8-sig'))[0] == 'utf-8-sig'
+    assert sniff_sample('a,b\n1,2\n'.encode('utf-32'))[0] == 'utf-32'
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+
+from sqldump import SQLDumpParser
+
+MYSQL_DUMP = """-- MySQL dump
+CREATE TABLE `users` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `email` varchar(255) DEFAULT NULL,
+  `note` text,
+  PRIMARY KEY (`id`),
+  KEY `email` (`email`)
+) ENGINE=InnoDB;
+INSERT INTO `users` VALUES (1,'a@example.com','it\\'s'),(2,'b@example.com','semi; (paren)'),(3,NULL,'line\\nbreak');
+INSERT INTO `users` (`email`, `id`) VALUES ('c@example.com', 4) ON DUPLICATE KEY UPDATE `email`=VALUES(`email`);
+INSERT INTO `users` VALUES (5,'d@example.com','O''Brien');
+"""
+
+POSTGRES_DUMP = """CREATE TABLE public.accounts (
+    id integer NOT NULL,
+    email text
+);
+COPY public.accounts (id, email, note) FROM stdin;
+1\ta@example.com\ttab\\there
+2\t\\N\tplain
+\\.
+INSERT INTO public.accounts VALUES (3, 'e@example.com');
+"""
+
+
+def parse(text, block_size=4096, encoding='utf-8'):
+    data = text.encode(encoding)
+    return list(SQLDumpParser('dump.sql', encoding=encoding, block_size=block_size, fileobj=io.BytesIO(data)))
+
+
+def test_insert_values_and_escapes():
+    rows = parse(MYSQL_DUMP)
+    assert rows[:3] == [
+        ('users', {'id': '1', 'email': 'a@example.com', 'note': "it's"}),
+        ('users', {'id': '2', 'email': 'b@example.com', 'note': 'semi; (paren)'}),
+        ('users', {'id': '3', 'email': None, 'note': 'line\nbreak'}),
+    ]
+    assert rows[-1] == ('users', {'id': '5', 'email': 'd@example.com', 'note': "O'Brien"})
+
+
+def test_on_duplicate_key_clause_is_skipped():
+    rows = parse(MYSQL_DUMP)
+    assert ('users', {'email': 'c@example.com', 'id': '4'}) in rows
+    assert len(rows) == 5
+
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 7, 64])
+def test_statements_spanning_blocks(block_size):
+    assert parse(MYSQL_DUMP, block_size) == parse(MYSQL_DUMP)
+    assert parse(POSTGRES_DUMP, block_size) == parse(POSTGRES_DUMP)
+
+
+def test_multibyte_characters_split_across_blocks():
+    dump = "INSERT INTO t (name) VALUES ('Zoë 日本');\n"
+    assert parse(dump, block_size=1) == [('t', {'name': 'Zoë 日本'})]
+
+
+def test_copy_block():
+    rows = parse(POSTGRES_DUMP)
+    assert rows == [
+        ('accounts', {'id': '1', 'email': 'a@example.com', 'note': 'tab\there'}),
+        ('accounts', {'id': '2', 'email': None, 'note': 'plain'}),
+        ('accounts', {'id': '3', 'email': 'e@example.com'}),
+    ]
+
+
+def test_insert_without_known_columns():
+    assert parse("INSERT INTO t VALUES (1,'x');") == [('t', {'column1': '1', 'column2': 'x'})]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from recordcodec import RecordCodec
+from storage import SQLiteBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'user_data.db'))
+    yield backend
+    backend.close()
+
+
+def row(codec, email, **columns):
+    record = {'email': email, **columns}
+    values = {'email': email, 'source': 'leak.csv', **columns}
+    values['record'] = codec.encode(record, values)
+    return values
+
+
+def test_upsert_updates_only_the_given_columns(backend):
+    backend.insert_batch([row(backend.codec, 'a@example.com', username='alice', city='Oslo')])
+    backend.insert_batch([{'email': 'a@example.com', 'username': 'alice2'}])
+
+    [stored] = backend.get('a@example.com')
+    assert stored['username'] == 'alice2'
+    assert stored['city'] == 'Oslo'
+    assert backend.count() == 1
+
+
+def test_lookup_get_and_scan(backend):
+    backend.insert_batch([
+        row(backend.codec, f'u{i}@example.com', username='shared' if i % 2 else f'user{i}')
+        for i in range(10)
+    ])
+    assert backend.get('missing@example.com') == []
+    assert [r['email'] for r in backend.lookup('email', 'u3@example.com')] == ['u3@example.com']
+    assert len(backend.lookup('username', 'shared')) == 5
+    assert len(backend.lookup('username', 'shared', limit=2)) == 2
+    assert len(list(backend.scan(limit=4))) == 4
+    assert backend.count() == 10
+
+
+def test_records_decode_to_their_json(backend):
+    record = {'email': 'a@example.com', 'username': 'alice', 'extra': [1, 2]}
+    values = {'email': 'a@example.com', 'username': 'alice'}
+    values['record'] = backend.codec.encode(record, values)
+    backend.insert_batch([values])
+    [stored] = backend.get('a@example.com')
+    assert 'record' not in stored
+    assert json.loads(stored['data']) == {'email': 'a@example.com', 'username': 'alice', 'extra': [1, 2]}
+
+
+def test_key_lists_are_loaded_after_reopening(tmp_path):
+    path = str(tmp_path / 'user_data.db')
+    backend = SQLiteBackend(path)
+    backend.insert_batch([row(backend.codec, 'a@example.com', username='alice')])
+    backend.close()
+
+    reopened = SQLiteBackend(path, codec=RecordCodec())
+    try:
+        [stored] = reopened.lookup('username', 'alice')
+        assert json.loads(stored['data']) == {'email': 'a@example.com', 'username': 'alice'}
+    finally:
+        reopened.close()
+
+
+def test_add_column(backend):
+    backend.add_column('twitter')
+    assert 'twitter' in backend.columns()
+    backend.insert_batch([{'email': 'a@example.com', 'twitter': '@alice'}])
+    assert backend.lookup('twitter', '@alice')[0]['email'] == 'a@example.com'
+    with pytest.raises(ValueError, match='conflicts with an existing column'):
+        backend.add_column('twitter')
+    with pytest.raises(ValueError, match='Invalid column name'):
+        backend.add_column('bad name; DROP TABLE user_data')
+
+
+def test_async_wrappers(backend):
+    async def main():
+        await backend.insert_batch_async([{'email': 'a@example.com', 'username': 'alice'}])
+        return await backend.lookup_async('username', 'alice'), await backend.count_async()
+
+    rows, count = asyncio.run(main())
+    assert rows[0]['email'] == 'a@example.com' and count == 1
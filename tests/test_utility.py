@@ -0,0 +1,63 @@
+import collections
+import csv
+import os
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('tkinter')
+
+import utility
+from utility import read_random_line, sample_lines
+
+
+def test_single_row_file(tmp_path):
+    path = tmp_path / 'one.csv'
+    path.write_text('email,password\na@example.com,secret')
+    assert read_random_line(str(path)) == (['email', 'password'], ['a@example.com', 'secret'])
+
+
+def test_every_row_can_be_sampled(tmp_path, monkeypatch):
+    # A small sniffing window makes sample_lines seek instead of reading it all
+    monkeypatch.setattr(utility, 'SNIFF_BYTES', 256)
+    path = tmp_path / 'leak.csv'
+    with open(path, 'w') as f:
+        f.write('id,pad\n')
+        for i in range(50):
+            f.write(f'{i},{"x" * (1 + i * 7 % 120)}\n')
+
+    seen = collections.Counter()
+    for seed in range(2000):
+        _, rows, encoding, _ = sample_lines(str(path), 1, seed=seed)
+        seen[rows[0][0]] += 1
+    assert encoding == 'utf-8'
+    assert set(seen) == {str(i) for i in range(50)}
+    # Uniform would be 40 each; long rows must not dominate
+    assert max(seen.values()) < 100
+
+
+@pytest.mark.parametrize('encoding', ['utf-16', 'utf-32'])
+def test_wide_encodings_are_read_sequentially(tmp_path, encoding):
+    path = tmp_path / 'wide.csv'
+    path.write_text('email;name\na@example.com;Zoë\nb@example.com;Åsa\n', encoding=encoding)
+    headers, rows, detected, dialect = sample_lines(str(path), 5, seed=1)
+    assert detected == encoding
+    assert dialect.delimiter == ';'
+    assert headers == ['email', 'name']
+    assert sorted(rows) == [['a@example.com', 'Zoë'], ['b@example.com', 'Åsa']]
+
+
+def test_write_chunks_to_csv_keeps_late_columns(tmp_path):
+    chunks = [
+        ('users', [{'id': '1', 'email': 'a@example.com'}]),
+        ('users', [{'id': '2', 'email': 'b@example.com', 'note': 'two\nlines'}]),
+        ('orders', [{'order': '7'}]),
+    ]
+    paths = utility.write_chunks_to_csv(chunks, str(tmp_path / 'dump.csv'))
+
+    assert [os.path.basename(p) for p in paths] == ['dump_users.csv', 'dump_orders.csv']
+    with open(paths[0], newline='') as f:
+        assert list(csv.DictReader(f)) == [
+            {'id': '1', 'email': 'a@example.com', 'note': None},
+            {'id': '2', 'email': 'b@example.com', 'note': 'two\nlines'},
+        ]
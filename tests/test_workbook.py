@@ -0,0 +1,68 @@
+import datetime
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+from workbook import iter_workbook_chunks, workbook_dimensions
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = openpyxl.Workbook()
+    users = wb.active
+    users.title = 'users'
+    # Leading blank rows: the header is the first row with a value
+    users['A3'] = 'email'
+    users['B3'] = 'phone'
+    users['C3'] = 'joined'
+    for i in range(25):
+        users.append([f'u{i}@example.com', 5550100.0 + i, datetime.datetime(2020, 1, 1 + i)])
+    users.append(['wide@example.com', 1.5, datetime.date(2021, 5, 6), 'extra', None, 'more'])
+
+    orders = wb.create_sheet('orders')
+    orders.append(['order', None])
+    orders.append([7, 'x'])
+    orders.append([None, None])
+    orders.append([8, 'y'])
+
+    wb.create_sheet('empty')
+    path = tmp_path / 'leak.xlsx'
+    wb.save(path)
+    return str(path)
+
+
+def test_sheets_and_records(workbook):
+    chunks = list(iter_workbook_chunks(workbook))
+    assert [sheet for sheet, _ in chunks] == ['users', 'orders']
+    users = chunks[0][1]
+    assert len(users) == 26
+    # Read-only sheets pad every row to the sheet width, so the columns of
+    # the wide row below show up empty in the others
+    assert users[0] == {
+        'email': 'u0@example.com', 'phone': '5550100', 'joined': '2020-01-01T00:00:00',
+        'column4': None, 'column5': None, 'column6': None,
+    }
+    assert chunks[1][1] == [{'order': '7', 'column2': 'x'}, {'order': '8', 'column2': 'y'}]
+
+
+def test_rows_wider_than_the_header(workbook):
+    wide = list(iter_workbook_chunks(workbook))[0][1][-1]
+    assert wide == {
+        'email': 'wide@example.com', 'phone': '1.5', 'joined': '2021-05-06T00:00:00',
+        'column4': 'extra', 'column5': None, 'column6': 'more',
+    }
+
+
+def test_chunk_boundaries(workbook):
+    chunks = list(iter_workbook_chunks(workbook, chunk_size=10))
+    assert [(sheet, len(records)) for sheet, records in chunks] == [
+        ('users', 10), ('users', 10), ('users', 6), ('orders', 2),
+    ]
+    assert chunks[1][1][0]['email'] == 'u10@example.com'
+
+
+def test_workbook_dimensions(workbook):
+    # Blank rows before the header aren't data rows; blank rows between
+    # records still count, the dimension can't tell them apart
+    assert workbook_dimensions(workbook) == {'users': 26, 'orders': 3, 'empty': 0}
@@ -0,0 +1,204 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+from writes import AdaptiveBatcher, InflightLimiter, ResilientWriter, RetryPolicy, TokenBucket, classify_error, payload_size
+
+
+def test_batch_grows_while_fast():
+    batcher = AdaptiveBatcher(batch_size=100, concurrency=4, increase_rows=50)
+    for _ in range(5):
+        batcher.record(batcher.batch_size, 1000, 0.01)
+    assert batcher.batch_size == 350
+    # About one more batch in flight per round of completed batches
+    assert batcher.concurrency == 5
+
+
+def test_backpressure_cuts_both_knobs():
+    batcher = AdaptiveBatcher(batch_size=400, concurrency=8)
+    batcher.record(400, 1000, 0.01, 'timeout')
+    assert (batcher.batch_size, batcher.concurrency) == (200, 4)
+    batcher.record(200, 1000, 0.01, 'overloaded')
+    assert (batcher.batch_size, batcher.concurrency) == (100, 2)
+
+
+def test_slow_batches_cut_concurrency_only():
+    batcher = AdaptiveBatcher(batch_size=400, concurrency=8, target_latency=0.1)
+    batcher.record(400, 1000, 0.5)
+    assert (batcher.batch_size, batcher.concurrency) == (400, 4)
+
+
+def test_payload_target_caps_batch_size():
+    batcher = AdaptiveBatcher(batch_size=1000, target_bytes=10000)
+    batcher.record(1000, 100000, 0.01)
+    # 100 bytes a row against a 10000 byte target
+    assert batcher.batch_size == 100
+
+
+def test_data_errors_leave_the_knobs_alone():
+    batcher = AdaptiveBatcher(batch_size=400, concurrency=8)
+    batcher.record(400, 1000, 5.0, 'error')
+    assert (batcher.batch_size, batcher.concurrency) == (400, 8)
+
+
+def test_limits():
+    batcher = AdaptiveBatcher(batch_size=20, concurrency=1, min_batch=10, max_batch=60, max_concurrency=2)
+    for _ in range(5):
+        batcher.record(10, 100, 5.0, 'unavailable')
+    assert (batcher.batch_size, batcher.concurrency) == (10, 1)
+    for _ in range(20):
+        batcher.record(10, 100, 0.01)
+    assert (batcher.batch_size, batcher.concurrency) == (60, 2)
+
+
+class WriteTimeout(Exception):
+    pass
+
+
+class FlakyBackend:
+    """Backend whose first `failures` batches raise exc"""
+
+    def __init__(self, failures, exc=WriteTimeout):
+        self.failures = failures
+        self.exc = exc
+        self.calls = 0
+        self.rows = []
+
+    def hosts(self):
+        return ['node']
+
+    def insert_batch(self, rows):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc()
+        self.rows.extend(rows)
+
+    async def insert_batch_async(self, rows):
+        self.insert_batch(rows)
+
+
+def writer(max_attempts=3):
+    return ResilientWriter(AdaptiveBatcher(), RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.001))
+
+
+def test_payload_size():
+    assert payload_size([{'a': 'xy', 'b': b'abc', 'c': 12345, 'd': 1.5, 'e': None, 'f': ''}]) == 13
+
+
+def test_classify_error_by_class_name():
+    assert classify_error(WriteTimeout()) == 'timeout'
+    assert classify_error(ValueError()) == 'error'
+
+
+def test_retry_delay_is_jittered_below_the_ceiling():
+    policy = RetryPolicy(base_delay=0.1, max_delay=10.0)
+    random.seed(1)
+    delays = [policy.delay(3, 'timeout') for _ in range(200)]
+    assert all(0 <= delay <= 0.8 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(policy.delay(20, 'unavailable') <= 10.0 for _ in range(50))
+    assert policy.retryable('overloaded') and not policy.retryable('error')
+
+
+def test_writer_retries_transient_failures():
+    backend = FlakyBackend(failures=2)
+    writer().write(backend, [{'email': 'a@example.com'}])
+    assert backend.calls == 3
+    assert backend.rows == [{'email': 'a@example.com'}]
+
+
+def test_writer_gives_up_after_max_attempts():
+    backend = FlakyBackend(failures=10)
+    with pytest.raises(WriteTimeout):
+        writer(max_attempts=3).write(backend, [{'email': 'a@example.com'}])
+    assert backend.calls == 3
+
+
+def test_writer_does_not_retry_data_errors():
+    backend = FlakyBackend(failures=1, exc=ValueError)
+    with pytest.raises(ValueError):
+        asyncio.run(writer().write_async(backend, [{'email': 'a@example.com'}]))
+    assert backend.calls == 1
+
+
+def test_limiter_blocks_threads_at_the_cap():
+    limiter = InflightLimiter(per_host=2)
+    limiter.acquire(1)
+    limiter.acquire(1)
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(1), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.in_flight == 2
+
+
+def test_limiter_caps_coroutines():
+    limiter = InflightLimiter(per_host=3)
+    peak = 0
+
+    async def task():
+        nonlocal peak
+        await limiter.acquire_async(1)
+        try:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.001)
+        finally:
+            limiter.release()
+
+    async def main():
+        await asyncio.gather(*(task() for _ in range(50)))
+
+    asyncio.run(main())
+    assert peak == 3
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    limiter = InflightLimiter(per_host=1)
+
+    async def main():
+        await limiter.acquire_async(1)
+        waiter = asyncio.ensure_future(limiter.acquire_async(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire_async(1), 1)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_wake_up_of_a_cancelled_waiter_is_passed_on():
+    limiter = InflightLimiter(per_host=1)
+
+    async def main():
+        await limiter.acquire_async(1)
+        first = asyncio.ensure_future(limiter.acquire_async(1))
+        second = asyncio.ensure_future(limiter.acquire_async(1))
+        await asyncio.sleep(0)
+        # The release picks first, which is cancelled before its wake-up runs
+        limiter.release()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_token_bucket():
+    assert TokenBucket().reserve(10 ** 6) == 0.0
+    bucket = TokenBucket(rate=100, burst=10)
+    assert bucket.reserve(10) == 0.0
+    # The burst is spent; the next 10 rows wait about 10 / 100 seconds
+    assert 0.09 < bucket.reserve(10) <= 0.1
+    # and callers behind them wait longer still
+    assert 0.19 < bucket.reserve(10) <= 0.2
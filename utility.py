@@ -6,30 +6,105 @@ from tkinter import filedialog, simpledialog, messagebox
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 import os
-import io
 import csv
+import shutil
+from sqldump import iter_dump_chunks
+from workbook import iter_workbook_chunks, workbook_dimensions
+from splitter import SNIFF_BYTES, estimate_parts, is_wide_encoding, sniff_sample, split_file
 
-def read_random_line(file_path, encoding='utf-8'):
-    try:
-        with open(file_path, 'rb') as f:
-            content = f.read().decode(encoding, errors='replace')
-        df = pd.read_csv(io.StringIO(content))
-    except UnicodeDecodeError:
-        encodings = ['latin1', 'iso-8859-1', 'cp1252']
-        for enc in encodings:
-            try:
-                with open(file_path, 'rb') as f:
-                    content = f.read().decode(enc, errors='replace')
-                df = pd.read_csv(io.StringIO(content))
-                break
-            except UnicodeDecodeError:
+SCAN_BYTES = 64 * 1024
+
+def _line_at(f, offset, data_start):
+    """Return the line containing byte offset, scanning back to its start"""
+    start = offset
+    while start > data_start:
+        step = min(SCAN_BYTES, start - data_start)
+        f.seek(start - step)
+        newline = f.read(step).rfind(b'\n')
+        if newline != -1:
+            start = start - step + newline + 1
+            break
+        start -= step
+    f.seek(start)
+    return f.readline()
+
+def _seek_sample(f, k, rng, file_size):
+    """Pick k lines after the header by seeking to random byte offsets"""
+    header = f.readline()
+    data_start = f.tell()
+    window = f.read(SNIFF_BYTES)
+    lines = window.split(b'\n')
+    if data_start + len(window) >= file_size:
+        # The window holds every row, so pick from it directly
+        lines = [line for line in lines if line.strip()]
+        return header, rng.sample(lines, min(k, len(lines)))
+
+    # The last piece of the window may be cut mid-line
+    lines = [line for line in lines[:-1] if line.strip()]
+    # An offset lands in a line in proportion to its length; keeping a
+    # line with probability shortest/length makes every row equally likely
+    shortest = min((len(line) + 1 for line in lines), default=SNIFF_BYTES)
+    rows = []
+    attempts = 0
+    while len(rows) < k and attempts < k * 100:
+        attempts += 1
+        line = _line_at(f, rng.randrange(data_start, file_size), data_start)
+        if line.strip() and rng.random() * len(line) < shortest:
+            rows.append(line)
+    if len(rows) < k:
+        # Very uneven line lengths can exhaust the attempts; top up from
+        # the window rather than return too few
+        rows.extend(rng.sample(lines, min(k - len(rows), len(lines))))
+    return header, rows
+
+def _stream_sample(file_path, k, encoding, rng):
+    """Reservoir sample k lines in one sequential pass over the decoded text"""
+    rows = []
+    seen = 0
+    with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
+        header = f.readline()
+        for line in f:
+            if not line.strip():
                 continue
-        else:
-            raise ValueError("Unable to decode file with available encodings.")
-    
-    headers = df.columns.tolist()
-    random_row = df.sample().iloc[0].tolist()
-    return headers, random_row
+            seen += 1
+            if len(rows) < k:
+                rows.append(line)
+            else:
+                i = rng.randrange(seen)
+                if i < k:
+                    rows[i] = line
+    return header, rows
+
+def sample_lines(file_path, k=1, encoding=None, seed=None):
+    """Return the header, K random rows, the encoding and the dialect of a file.
+
+    Rows are picked by seeking to random byte offsets and reading the line
+    there, so only the header, a small sniffing window and about K lines
+    are read no matter how large the file is. UTF-16/32 files can't be
+    split at byte offsets and are sampled in one sequential pass instead.
+    """
+    file_size = os.path.getsize(file_path)
+    rng = random.Random(seed)
+    with open(file_path, 'rb') as f:
+        sniffed_encoding, dialect = sniff_sample(f.read(SNIFF_BYTES))
+        encoding = encoding or sniffed_encoding
+        if not is_wide_encoding(encoding):
+            f.seek(0)
+            header, rows = _seek_sample(f, k, rng, file_size)
+            header = header.decode(encoding, errors='replace')
+            rows = [row.decode(encoding, errors='replace') for row in rows]
+    if is_wide_encoding(encoding):
+        header, rows = _stream_sample(file_path, k, encoding, rng)
+
+    headers = next(csv.reader([header.rstrip('\r\n')], dialect), [])
+    rows = [next(csv.reader([row.rstrip('\r\n')], dialect), []) for row in rows]
+    return headers, rows, encoding, dialect
+
+def read_random_line(file_path, encoding=None):
+    headers, rows, _, _ = sample_lines(file_path, k=1, encoding=encoding)
+    if not rows:
+        raise ValueError("File has no data rows to sample.")
+    return headers, rows[0]
 
 def modify_header(file_path, encoding='utf-8'):
     try:
@@ -68,31 +143,78 @@ def is_valid_sqlite(file_path):
 
 def convert_to_csv(file_path, output_path, encoding='utf-8'):
     chunk_size = 100000  # Adjust the chunk size as needed
-    if file_path.endswith('.sql'):
-        if is_valid_sqlite(file_path):
-            try:
-                conn = sqlite3.connect(file_path)
-                query = "SELECT * FROM table_name"
-                total_rows = pd.read_sql_query("SELECT COUNT(*) FROM table_name", conn).iloc[0, 0]
-                with tqdm(total=total_rows, desc="Converting SQL to CSV") as pbar:
-                    for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size):
-                        chunk.to_csv(output_path, mode='a', index=False, encoding=encoding, header=not os.path.exists(output_path))
-                        pbar.update(len(chunk))
-                conn.close()
-            except Exception as e:
-                print(f"Error converting SQL to CSV: {e}")
-        else:
-            raise ValueError("The file is not a valid SQLite database.")
-    elif file_path.endswith('.xlsx'):
-        total_rows = pd.read_excel(file_path, nrows=0).shape[0]
+    if file_path.endswith('.sql') and is_valid_sqlite(file_path):
+        try:
+            conn = sqlite3.connect(file_path)
+            query = "SELECT * FROM table_name"
+            total_rows = pd.read_sql_query("SELECT COUNT(*) FROM table_name", conn).iloc[0, 0]
+            with tqdm(total=total_rows, desc="Converting SQL to CSV") as pbar:
+                for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size):
+                    chunk.to_csv(output_path, mode='a', index=False, encoding=encoding, header=not os.path.exists(output_path))
+                    pbar.update(len(chunk))
+            conn.close()
+        except Exception as e:
+            print(f"Error converting SQL to CSV: {e}")
+    elif file_path.endswith(('.sql', '.mybbsql')):
+        convert_dump_to_csv(file_path, output_path, encoding, chunk_size)
+    elif file_path.endswith(('.xlsx', '.xlsm')):
+        total_rows = sum(workbook_dimensions(file_path).values())
         with tqdm(total=total_rows, desc="Converting Excel to CSV") as pbar:
-            for chunk in pd.read_excel(file_path, chunksize=chunk_size):
-                chunk.to_csv(output_path, mode='a', index=False, encoding=encoding, header=not os.path.exists(output_path))
-                pbar.update(len(chunk))
-    elif file_path.endswith('.mybbsql'):
-        import mysql.connector
-        conn = mysql.connector.connect(user='username', password='password', host='localhost', database='database_name')
-        raise ValueError(".mybbsql is not a supported file format")
+            written = write_chunks_to_csv(iter_workbook_chunks(file_path, chunk_size), output_path, encoding, pbar)
+        if not written:
+            raise ValueError("The workbook contains no data rows.")
+
+def write_chunks_to_csv(chunks, output_path, encoding='utf-8', pbar=None):
+    """Write (name, records) chunks to one CSV per name; return the paths written.
+
+    Columns that only show up in later records are appended to the header,
+    which is rewritten once at the end if it grew.
+    """
+    base_name, ext = os.path.splitext(output_path)
+    writers = {}
+    try:
+        for name, records in chunks:
+            if name not in writers:
+                path = f"{base_name}_{name}{ext or '.csv'}"
+                out = open(path, 'w', newline='', encoding=encoding)
+                writer = csv.DictWriter(out, fieldnames=list(records[0].keys()), extrasaction='ignore')
+                writer.writeheader()
+                writers[name] = (path, out, writer, len(writer.fieldnames))
+            writer = writers[name][2]
+            known = set(writer.fieldnames)
+            for record in records:
+                if not record.keys() <= known:
+                    # Earlier rows just end before the new columns
+                    writer.fieldnames.extend(key for key in record if key not in known)
+                    known.update(record)
+                writer.writerow(record)
+            if pbar is not None:
+                pbar.update(len(records))
+    finally:
+        for _, out, _, _ in writers.values():
+            out.close()
+    for path, _, writer, header_size in writers.values():
+        if len(writer.fieldnames) > header_size:
+            _rewrite_header(path, writer.fieldnames, encoding)
+        print(f"Wrote {path}")
+    return [path for path, _, _, _ in writers.values()]
+
+def _rewrite_header(path, fieldnames, encoding):
+    """Replace the header of a CSV with fieldnames, copying the rows after it"""
+    with open(path, 'r', newline='', encoding=encoding) as src, \
+            open(path + '.tmp', 'w', newline='', encoding=encoding) as dst:
+        next(csv.reader(src))
+        csv.writer(dst).writerow(fieldnames)
+        shutil.copyfileobj(src, dst)
+    os.replace(path + '.tmp', path)
+
+def convert_dump_to_csv(file_path, output_path, encoding='utf-8', chunk_size=100000):
+    """Stream a MySQL/PostgreSQL text dump into one CSV per table"""
+    with tqdm(total=os.path.getsize(file_path), desc="Converting SQL dump to CSV", unit="B", unit_scale=True) as pbar:
+        chunks = iter_dump_chunks(file_path, chunk_size, encoding, progress=pbar.update)
+        written = write_chunks_to_csv(chunks, output_path, encoding)
+    if not written:
+        raise ValueError("No INSERT or COPY data found in the SQL dump.")
 
 def convert_text_to_csv(file_path, output_path, encoding='utf-8'):
     with open(file_path, 'r', encoding=encoding) as file:
@@ -104,22 +226,18 @@ def convert_text_to_csv(file_path, output_path, encoding='utf-8'):
     messagebox.showinfo("Success", "Text file converted to CSV successfully.")
 
 def partition_csv(file_path, rows_per_file, encoding='utf-8'):
-    base_name, ext = os.path.splitext(file_path)
-    chunk_size = rows_per_file
-    if ext == '.csv':
-        with pd.read_csv(file_path, encoding=encoding, chunksize=chunk_size) as reader:
-            for i, chunk in enumerate(reader):
-                chunk.to_csv(f"{base_name}_part{i+1}{ext}", index=False, encoding=encoding)
-    elif ext == '.txt':
-        with open(file_path, 'r', encoding=encoding) as file:
-            lines = file.readlines()
-        header = "email,password\n"
-        for i in range(0, len(lines), chunk_size):
-            chunk_lines = lines[i:i + chunk_size]
-            chunk_data = [line.strip().split(':') for line in chunk_lines if ':' in line]
-            chunk_df = pd.DataFrame(chunk_data, columns=['email', 'password'])
-            chunk_df.to_csv(f"{base_name}_part{i//chunk_size + 1}.csv", index=False, encoding=encoding)
-    messagebox.showinfo("Success", f"File partitioned into chunks of {rows_per_file} rows each.")
+    """Split a CSV or text file into parts of roughly rows_per_file rows.
+
+    Parts are cut at line (and for CSV, quote) aligned byte offsets and
+    copied in parallel; CSV parts repeat the header line. UTF-16/32 files
+    can't be cut at byte offsets and are refused.
+    """
+    if is_wide_encoding(encoding):
+        messagebox.showerror("Error", f"{encoding} files can't be partitioned; convert the file to UTF-8 first.")
+        return
+    parts = estimate_parts(file_path, rows_per_file)
+    part_paths = split_file(file_path, parts, log=print)
+    messagebox.showinfo("Success", f"File partitioned into {len(part_paths)} parts of about {rows_per_file} rows each.")
 
 def convert_messed_up_csv(file_path, output_path, encoding='utf-8'):
     with open(file_path, 'r', encoding=encoding) as file:
@@ -146,7 +264,7 @@ def save_file_dialog():
 
 def main_menu():
     while True:
-        print("1. Read a random line from a file")
+        print("1. Read random lines from a file")
         print("2. Modify header column names")
         print("3. Convert file to CSV")
         print("4. Convert text file to CSV (email:password)")
@@ -157,10 +275,13 @@ def main_menu():
 
         if choice == '1':
             file_path = open_file_dialog()
-            encoding = input("Enter file encoding (default is utf-8): ") or 'utf-8'
-            headers, random_line = read_random_line(file_path, encoding)
+            encoding = input("Enter file encoding (default is auto-detect): ") or None
+            count = int(input("Enter the number of random lines (default is 1): ") or 1)
+            headers, rows, encoding, dialect = sample_lines(file_path, count, encoding)
+            print(f"Encoding: {encoding}, delimiter: {dialect.delimiter!r}")
             print("Headers:", headers)
-            print("Random line:", random_line)
+            for row in rows:
+                print("Random line:", row)
         elif choice == '2':
             file_path = open_file_dialog()
             encoding = input("Enter file encoding (default is utf-8): ") or 'utf-8'
@@ -0,0 +1,321 @@
+"""Flow control for the write path.
+
+AdaptiveBatcher picks how many rows go into a write batch and how many
+batches may be in flight. Every finished batch is reported back with its
+row count, payload size, latency and outcome, and both knobs follow an
+AIMD rule: they grow additively while batches come back under the latency
+and payload targets, and are cut multiplicatively on timeouts, overload,
+slow batches or oversized payloads. Decisions are exported as metrics.
+
+ResilientWriter runs each batch through a global token bucket and a
+per-host in-flight cap, and retries timeouts, overload and unavailable
+errors with jittered exponential backoff. Batches are upserts of fixed
+values, so a retry after an ambiguous timeout writes the same result.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Driver exceptions by class name, so classifying doesn't import the driver
+_TIMEOUTS = {'OperationTimedOut', 'WriteTimeout', 'ReadTimeout', 'WriteFailure', 'ReadFailure'}
+_OVERLOADED = {'OverloadedErrorMessage', 'Overloaded', 'IsBootstrappingErrorMessage'}
+_UNAVAILABLE = {'Unavailable', 'NoHostAvailable', 'ConnectionShutdown', 'ConnectionException'}
+
+
+def classify_error(exc):
+    """Return 'timeout', 'overloaded', 'unavailable' or 'error' for a failed write"""
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _TIMEOUTS:
+            return 'timeout'
+        if cls.__name__ in _OVERLOADED:
+            return 'overloaded'
+        if cls.__name__ in _UNAVAILABLE:
+            return 'unavailable'
+    return 'error'
+
+
+def payload_size(rows):
+    """Approximate serialized size of a batch: the length of all its values"""
+    return sum(
+        len(value) if isinstance(value, (str, bytes)) else len(str(value))
+        for row in rows for value in row.values() if value
+    )
+
+
+class AdaptiveBatcher:
+    """AIMD controller for write batch size and in-flight concurrency"""
+
+    def __init__(self, batch_size=500, concurrency=8, target_latency=0.2, target_bytes=512 * 1024,
+                 min_batch=10, max_batch=5000, min_concurrency=1, max_concurrency=64,
+                 increase_rows=50, decrease=0.5):
+        self.target_latency = target_latency
+        self.target_bytes = target_bytes
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase_rows = increase_rows
+        self.decrease = decrease
+        self._batch = float(batch_size)
+        self._concurrency = float(concurrency)
+        self._row_bytes = None
+        self._lock = threading.Lock()
+        self._publish()
+
+    @property
+    def batch_size(self):
+        return int(self._batch)
+
+    @property
+    def concurrency(self):
+        return int(self._concurrency)
+
+    def record(self, rows, payload_bytes, latency, outcome='ok'):
+        """Feed back one finished batch and adjust the knobs"""
+        metrics.BATCH_BYTES.observe(payload_bytes)
+        with self._lock:
+            if rows and payload_bytes:
+                row_bytes = payload_bytes / rows
+                self._row_bytes = row_bytes if self._row_bytes is None else 0.8 * self._row_bytes + 0.2 * row_bytes
+
+            if outcome in ('timeout', 'overloaded', 'unavailable'):
+                self._cut('concurrency', outcome)
+                self._cut('batch', outcome)
+            elif outcome != 'ok':
+                # Bad data, not back pressure: leave the knobs alone
+                return
+            elif latency > self.target_latency:
+                self._cut('concurrency', 'latency')
+            else:
+                # Roughly +1 batch in flight per round of completed batches
+                self._grow('concurrency', 1 / max(self._concurrency, 1), 'fast')
+
+            if outcome == 'ok':
+                if payload_bytes > self.target_bytes:
+                    self._cut('batch', 'bytes')
+                elif latency <= self.target_latency:
+                    self._grow('batch', self.increase_rows, 'fast')
+
+            # Never plan a batch that would blow the payload target
+            if self._row_bytes and self._batch * self._row_bytes > self.target_bytes:
+                self._batch = max(self.min_batch, self.target_bytes / self._row_bytes)
+            self._publish()
+
+    def _cut(self, knob, reason):
+        if knob == 'batch':
+            self._batch = max(self.min_batch, self._batch * self.decrease)
+        else:
+            self._concurrency = max(self.min_concurrency, self._concurrency * self.decrease)
+        metrics.BATCH_ADJUSTMENTS.labels(knob, 'down', reason).inc()
+
+    def _grow(self, knob, amount, reason):
+        if knob == 'batch':
+            before = int(self._batch)
+            self._batch = min(self.max_batch, self._batch + amount)
+            changed = int(self._batch) != before
+        else:
+            before = int(self._concurrency)
+            self._concurrency = min(self.max_concurrency, self._concurrency + amount)
+            changed = int(self._concurrency) != before
+        if changed:
+            metrics.BATCH_ADJUSTMENTS.labels(knob, 'up', reason).inc()
+
+    def _publish(self):
+        metrics.BATCH_SIZE.set(self.batch_size)
+        metrics.BATCH_CONCURRENCY.set(self.concurrency)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, scaled by the kind of failure"""
+
+    # Overloaded and unavailable clusters need longer to recover than a
+    # single slow replica
+    SCALE = {'timeout': 1, 'overloaded': 4, 'unavailable': 10}
+
+    def __init__(self, max_attempts=6, base_delay=0.1, max_delay=10.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def retryable(self, kind):
+        return kind in self.SCALE
+
+    def delay(self, attempt, kind):
+        ceiling = min(self.max_delay, self.base_delay * self.SCALE[kind] * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+
+class TokenBucket:
+    """Thread safe token bucket; rate is in rows per second, 0 disables it"""
+
+    def __init__(self, rate=0, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n):
+        """Take n tokens and return how long to wait before using them"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Going negative queues this caller behind the ones already waiting
+            self._tokens -= n
+            return max(0.0, -self._tokens / self.rate)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class InflightLimiter:
+    """Caps batches in flight at per_host times the number of live hosts.
+
+    Threads block in acquire(); coroutines await acquire_async() without
+    holding a thread. Both share the same count.
+    """
+
+    def __init__(self, per_host=32):
+        self.per_host = per_host
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._waiters = deque()
+
+    def acquire(self, hosts):
+        limit = self.per_host * max(1, hosts)
+        with self._condition:
+            while self.in_flight >= limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self, hosts):
+        limit = self.per_host * max(1, hosts)
+        while True:
+            with self._condition:
+                if self.in_flight < limit:
+                    self.in_flight += 1
+                    return
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                # Woken on a release; another waiter may win the slot, so recheck
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+                    else:
+                        # A release already picked this waiter; hand its
+                        # wake-up on or the freed slot sits idle
+                        self._wake_next()
+                raise
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+            self._wake_next()
+
+    def _wake_next(self):
+        # Called with the condition held
+        while self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if waiter.cancelled():
+                continue
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+                break
+            except RuntimeError:
+                # That waiter's loop is gone; wake the next one
+                continue
+
+
+class ResilientWriter:
+    """Writes batches through a backend with rate limiting, caps and retries.
+
+    write() blocks and suits threads; coroutines await write_async().
+    """
+
+    def __init__(self, batcher, retry=None, bucket=None, limiter=None):
+        self.batcher = batcher
+        self.retry = retry or RetryPolicy()
+        self.bucket = bucket or TokenBucket()
+        self.limiter = limiter or InflightLimiter()
+
+    def _rate_limit(self, rows):
+        wait = self.bucket.reserve(len(rows))
+        if wait:
+            metrics.RATE_LIMIT_WAIT.inc(wait)
+        return wait
+
+    def _failed(self, rows, payload, latency, exc, attempt):
+        """Record a failed attempt; return the backoff delay, or None to give up"""
+        kind = classify_error(exc)
+        self.batcher.record(len(rows), payload, latency, kind)
+        if not self.retry.retryable(kind) or attempt >= self.retry.max_attempts:
+            return None
+        metrics.WRITE_RETRIES.labels(kind).inc()
+        return self.retry.delay(attempt, kind)
+
+    def write(self, backend, rows):
+        if not rows:
+            return
+        payload = payload_size(rows)
+        hosts = len(backend.hosts())
+        attempt = 0
+        while True:
+            wait = self._rate_limit(rows)
+            if wait:
+                time.sleep(wait)
+            self.limiter.acquire(hosts)
+            start = time.perf_counter()
+            try:
+                backend.insert_batch(rows)
+            except Exception as e:
+                attempt += 1
+                delay = self._failed(rows, payload, time.perf_counter() - start, e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.batcher.record(len(rows), payload, time.perf_counter() - start)
+                return
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+
+    async def write_async(self, backend, rows):
+        """write() for coroutines: awaits the backend and sleeps on the loop"""
+        if not rows:
+            return
+        payload = payload_size(rows)
+        hosts = len(backend.hosts())
+        attempt = 0
+        while True:
+            wait = self._rate_limit(rows)
+            if wait:
+                await asyncio.sleep(wait)
+            await self.limiter.acquire_async(hosts)
+            start = time.perf_counter()
+            try:
+                await backend.insert_batch_async(rows)
+            except Exception as e:
+                attempt += 1
+                delay = self._failed(rows, payload, time.perf_counter() - start, e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.batcher.record(len(rows), payload, time.perf_counter() - start)
+                return
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)